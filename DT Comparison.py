@@ -1,21 +1,33 @@
 import dash
 from dash import dcc, html, Input, Output, State, ctx, dash_table
 import pandas as pd
-import base64
-import io
+import operator
 import os
-import tempfile
 from datetime import datetime
-from openpyxl import load_workbook
-from openpyxl.styles import Font
-from openpyxl.utils import get_column_letter
-
-app = dash.Dash(__name__)
+from functools import lru_cache
+import numpy as np
+from dt_compare import compare_incremental, mismatch_mask, render_result, take_rows
+from dt_reconcile import over_threshold, reconcile
+from dt_report import write_report
+from dt_cache import incremental_comparison
+from dt_workbook import detect_header, file_format, load_sheet
+from dt_timing import stage
+from dt_jobs import background_callback_manager, job_slot
+from dt_workspace import new_workspace, atomic_output, workspace_path
+from dt_uploads import chunked_upload, register_upload_routes, upload_path
+
+# Comparisons run as background jobs (see dt_jobs.py for the worker limit and job storage)
+app = dash.Dash(__name__, background_callback_manager=background_callback_manager)
 app.title = "Excel File Comparator"
+# Files are streamed to disk through /upload, callbacks only ever see the upload id
+register_upload_routes(app.server)
 
-temp_dir = tempfile.gettempdir()
-file1_path = os.path.join(temp_dir, "uploaded_file1.xlsx")
-file2_path = os.path.join(temp_dir, "uploaded_file2.xlsx")
+# The mismatch rows stay in the job workspace, the browser only ever receives one page of them
+MISMATCH_FILE = "mismatches.pkl"
+RECONCILIATION_FILE = "reconciliation.pkl"
+PAGE_SIZE = 50
+# Show how long each stage of a comparison took under the result (stage records are always logged, see dt_timing)
+TIMING_PANEL = os.environ.get('DT_COMPARE_TIMING_PANEL', '0') == '1'
 
 # UI
 app.layout = html.Div([
@@ -23,11 +35,9 @@ app.layout = html.Div([
 
     html.Div([
         html.Div([
-            html.Label("Upload File 1 (.xls, .xlsx, .csv):"),
-            dcc.Upload(
-                id='upload-file1',
-                children=html.Div(['📂 Drag & Drop or Click to Upload File 1']),
-                multiple=False,
+            html.Label("Upload File 1 (.xls, .xlsx, .csv, .parquet):"),
+            html.Div(
+                chunked_upload('upload-file1', '📂 Choose File 1', accept='.xls,.xlsx,.csv,.parquet'),
                 style={
                     'width': '100%', 'padding': '10px',
                     'border': '2px dashed #999', 'borderRadius': '5px',
@@ -37,11 +47,9 @@ app.layout = html.Div([
         ], style={"width": "45%", "display": "inline-block", "paddingRight": "5%"}),
 
         html.Div([
-            html.Label("Upload File 2 (.xls, .xlsx, .csv):"),
-            dcc.Upload(
-                id='upload-file2',
-                children=html.Div(['📂 Drag & Drop or Click to Upload File 2']),
-                multiple=False,
+            html.Label("Upload File 2 (.xls, .xlsx, .csv, .parquet):"),
+            html.Div(
+                chunked_upload('upload-file2', '📂 Choose File 2', accept='.xls,.xlsx,.csv,.parquet'),
                 style={
                     'width': '100%', 'padding': '10px',
                     'border': '2px dashed #999', 'borderRadius': '5px',
@@ -52,178 +60,395 @@ app.layout = html.Div([
     ]),
 
     html.Button("Compare Files", id="compare-button", n_clicks=0, style={"marginTop": "20px"}),
+    html.Button("Cancel", id="cancel-button", n_clicks=0, disabled=True,
+                style={"marginTop": "20px", "marginLeft": "10px"}),
+    html.Div([
+        html.Progress(id='progress-bar', value='0', max='100', style={"width": "300px"}),
+        html.Span(id='progress-text', style={"marginLeft": "10px"}),
+    ], style={"marginTop": "10px"}),
     html.Div(id='error-message', style={"color": "red", "marginTop": "10px"}),
 
     html.Hr(),
-    html.Div(id='comparison-table')
+    html.Div(id='comparison-summary'),
+    dcc.Store(id='comparison-result'),
+    html.Div(id='table-container', style={'display': 'none'}, children=dash_table.DataTable(
+        id='mismatch-table',
+        columns=[],
+        data=[],
+        page_action='custom',
+        page_current=0,
+        page_size=PAGE_SIZE,
+        sort_action='custom',
+        sort_mode='multi',
+        sort_by=[],
+        filter_action='custom',
+        filter_query='',
+        style_table={'overflowX': 'auto', 'marginTop': '20px'},
+        style_cell={'textAlign': 'left', 'fontFamily': 'Arial', 'padding': '5px'},
+    )),
+    html.Div(id='reconciliation-container', style={'display': 'none'}, children=[
+        html.H4("Quantity reconciliation", style={"marginTop": "30px"}),
+        html.Label("Show groups with a variance of at least (%): "),
+        dcc.Input(id='variance-threshold', type='number', min=0, value=0, debounce=True),
+        dash_table.DataTable(
+            id='reconciliation-table',
+            columns=[],
+            data=[],
+            page_size=PAGE_SIZE,
+            sort_action='native',
+            style_table={'overflowX': 'auto', 'marginTop': '10px'},
+            style_cell={'textAlign': 'left', 'fontFamily': 'Arial', 'padding': '5px'},
+            style_data_conditional=[{'if': {'filter_query': '{Quantity_Diff} != 0', 'column_id': 'Quantity_Diff'},
+                                     'color': 'red'}],
+        ),
+    ]),
 ])
 
-def save_uploaded_file(contents, filename, temp_name):
-    content_type, content_string = contents.split(',')
-    decoded = base64.b64decode(content_string)
-    extension = filename.split('.')[-1].lower()
-
-    path = os.path.join(tempfile.gettempdir(), temp_name + ".xlsx")
-
-    if extension == 'csv':
-        df = pd.read_csv(io.StringIO(decoded.decode('utf-8')))
-        df.to_excel(path, index=False)
-    elif extension in ['xls', 'xlsx']:
-        with open(path, 'wb') as f:
-            f.write(decoded)
-    else:
-        return None
-    return path
+def save_uploaded_file(upload):
+    # The file is already on disk (streamed by /upload); CSV and Parquet are read as they are by load_sheet
+    path = upload_path(upload['upload_id'])
+    if path is None:
+        raise ValueError(f"Upload of {upload['filename']} not found, please upload it again.")
+    return path if file_format(upload['filename']) else None
 
 # Callback
 @app.callback(
-    Output('comparison-table', 'children'),
+    Output('comparison-summary', 'children'),
+    Output('comparison-result', 'data'),
     Output('error-message', 'children'),
     Input('compare-button', 'n_clicks'),
-    State('upload-file1', 'contents'),
-    State('upload-file1', 'filename'),
-    State('upload-file2', 'contents'),
-    State('upload-file2', 'filename')
+    State('upload-file1', 'data'),
+    State('upload-file2', 'data'),
+    background=True,
+    running=[
+        (Output('compare-button', 'disabled'), True, False),
+        (Output('cancel-button', 'disabled'), False, True),
+    ],
+    cancel=[Input('cancel-button', 'n_clicks')],
+    progress=[Output('progress-bar', 'value'), Output('progress-text', 'children')],
+    prevent_initial_call=True
 )
-def compare_files(n_clicks, contents1, filename1, contents2, filename2):
+def compare_files(set_progress, n_clicks, upload1, upload2):
     if not n_clicks:
-        return dash.no_update, ""
-
-    if not contents1 or not contents2:
-        return None, "❌ Error: Please upload both files."
-
+        return dash.no_update, dash.no_update, ""
+
+    if not upload1 or not upload2:
+        return None, None, "❌ Error: Please upload both files."
+
+    with job_slot(on_wait=lambda: set_progress(("0", "Waiting for a free worker..."))):
+        return run_comparison(set_progress, upload1, upload2)
+
+def compare_paths(set_progress, path1, path2, stages=None, previous=None):
+    set_progress(("25", "Reading files..."))
+    column_mapping = {
+        'IA_Code': ['IA_Code_1', 'IA_CODE1_DESC_NEW'],
+        'Quantity': ['QUANTITY', 'FINAL_LETTERSHOP_QTY'],
+        'PRIMARY_SOURCE_CODE': ['PRIMARY_SOURCE_CODE', 'PRIMARY_SOURCE_CODE'],
+        'PRIMARY_SPID': ['PRIMARY_SPID', 'PRIMARY_SPID1_NEW'],
+        'CAMPAIGN_CODE': ['CAMPAIGN_CODE', 'CAMPAIGN_CODE'],
+        'TEMPLATE_CODE': ['TEMPLATE_CODE', 'TEMPLATE_CODE'],
+        'EXPIRATION_DATE': ['EXPIRATION_DATE', 'EXPIRATION_DATE'],
+        'PRESCREEN_DATE': ['PRESCREEN_DATE', 'PRESCREEN_DATE'],
+        'POID': ['POID', 'POID'],
+        'CELL_ID': ['CELL_ID', 'CELL_ID']
+    }
+
+    # The header row is found from the known column names (a Mail Plan has a banner above it),
+    # and parsed frames are cached by file content, so a file compared before is not parsed again
+    with stage('parse', stages) as info:
+        names = {name for variants in column_mapping.values() for name in variants}
+        header1 = detect_header(path1, names, default=0)
+        header2 = detect_header(path2, names, default=0)
+        df1 = load_sheet(path1, header=header1)
+        df2 = load_sheet(path2, header=header2)
+        info.update(rows1=len(df1), rows2=len(df2), header1=header1, header2=header2)
+
+    file1_rename = {}
+    file2_rename = {}
+    for std_name, (f1_col, f2_col) in column_mapping.items():
+        if f1_col in df1.columns:
+            file1_rename[f1_col] = std_name
+        if f2_col in df2.columns:
+            file2_rename[f2_col] = std_name
+
+    df1.rename(columns=file1_rename, inplace=True)
+    df2.rename(columns=file2_rename, inplace=True)
+
+    common_columns = list(set(file1_rename.values()) & set(file2_rename.values()))
+    if not common_columns:
+        common_columns = df1.columns.intersection(df2.columns).tolist()
+
+    def normalize_date(val):
+        if pd.isnull(val):
+            return None
+        val_str = str(val).strip()
+        if val_str.isdigit() and 7 <= len(val_str) <= 8:
+            try:
+                padded = val_str.zfill(8)
+                return datetime.strptime(padded, "%m%d%Y").date()
+            except:
+                pass
+        for fmt in ("%m/%d/%Y", "%Y%m%d", "%m%d%Y"):
+            try:
+                return datetime.strptime(val_str, fmt).date()
+            except ValueError:
+                continue
+        return val
+
+    def normalize_dates(series):
+        # normalize_date once per distinct value, spread back to the rows by their factorize codes
+        codes, uniques = pd.factorize(series)
+        mapped = pd.Series(uniques, dtype=object).map(normalize_date).to_numpy(dtype=object)
+        values = np.full(len(series), None, dtype=object)
+        valid = codes >= 0
+        values[valid] = mapped[codes[valid]]
+        # Same dtype as Series.apply would infer (an untouched datetime column stays datetime64)
+        return pd.Series(values, index=series.index).infer_objects()
+
+    with stage('normalize_dates', stages):
+        for col in common_columns:
+            if "date" in col.lower():
+                df1[col] = normalize_dates(df1[col])
+                df2[col] = normalize_dates(df2[col])
+
+    set_progress(("50", "Comparing..."))
+    # With a previous run sharing one of the files, only the rows that changed since are compared again
+    with stage('align_compare', stages) as info:
+        result, hashes = compare_incremental(df1, df2, 'CELL_ID', previous, columns=common_columns, strip=True)
+        info.update(rows=len(result[0]), left_only=len(result[3]), right_only=len(result[4]),
+                    cells=result[1].size, diff_cells=len(result[2]), incremental=previous is not None)
+    return result, hashes
+
+def timing_panel(records):
+    # Collapsed table of the dt_timing stage records of one job
+    header = html.Tr([html.Th(h, style={'textAlign': 'left', 'paddingRight': '15px'})
+                      for h in ("Stage", "Seconds", "RSS MB", "Peak MB", "Counts")])
+    rows = [html.Tr([
+        html.Td(r['stage']), html.Td(f"{r['seconds']:.3f}"), html.Td(r['rss_mb']), html.Td(r['peak_rss_mb']),
+        html.Td(', '.join(f"{k}={v}" for k, v in r.items()
+                          if k not in ('stage', 'seconds', 'rss_mb', 'peak_rss_mb', 'py_peak_mb'))),
+    ]) for r in records]
+    return html.Details([html.Summary("Stage timings"), html.Table([header] + rows)], style={"marginTop": "10px"})
+
+def run_comparison(set_progress, upload1, upload2):
+    stages = []
     try:
-        path1 = save_uploaded_file(contents1, filename1, "uploaded_file1")
-        path2 = save_uploaded_file(contents2, filename2, "uploaded_file2")
+        set_progress(("10", "Preparing uploaded files..."))
+        workspace = new_workspace()
+        with stage('save_uploads', stages):
+            path1 = save_uploaded_file(upload1)
+            path2 = save_uploaded_file(upload2)
 
         if not path1 or not path2:
-            return None, "❌ Error: Unsupported file format."
+            return None, None, "❌ Error: Unsupported file format."
 
         # ========== START: YOUR COMPARISON LOGIC ==========
-        sheet1 = pd.ExcelFile(path1).sheet_names[0]
-        sheet2 = pd.ExcelFile(path2).sheet_names[0]
-
-        df1 = pd.read_excel(path1, sheet_name=sheet1)
-        df2 = pd.read_excel(path2, sheet_name=sheet2)
-
-        column_mapping = {
-            'IA_Code': ['IA_Code_1', 'IA_CODE1_DESC_NEW'],
-            'Quantity': ['QUANTITY', 'FINAL_LETTERSHOP_QTY'],
-            'PRIMARY_SOURCE_CODE': ['PRIMARY_SOURCE_CODE', 'PRIMARY_SOURCE_CODE'],
-            'PRIMARY_SPID': ['PRIMARY_SPID', 'PRIMARY_SPID1_NEW'],
-            'CAMPAIGN_CODE': ['CAMPAIGN_CODE', 'CAMPAIGN_CODE'],
-            'TEMPLATE_CODE': ['TEMPLATE_CODE', 'TEMPLATE_CODE'],
-            'EXPIRATION_DATE': ['EXPIRATION_DATE', 'EXPIRATION_DATE'],
-            'PRESCREEN_DATE': ['PRESCREEN_DATE', 'PRESCREEN_DATE'],
-            'POID': ['POID', 'POID'],
-            'CELL_ID': ['CELL_ID', 'CELL_ID']
-        }
-
-        file1_rename = {}
-        file2_rename = {}
-        for std_name, (f1_col, f2_col) in column_mapping.items():
-            if f1_col in df1.columns:
-                file1_rename[f1_col] = std_name
-            if f2_col in df2.columns:
-                file2_rename[f2_col] = std_name
-
-        df1.rename(columns=file1_rename, inplace=True)
-        df2.rename(columns=file2_rename, inplace=True)
-
-        common_columns = list(set(file1_rename.values()) & set(file2_rename.values()))
-        if not common_columns:
-            common_columns = df1.columns.intersection(df2.columns).tolist()
-
-        if 'CELL_ID' in df1.columns:
-            df1['CELL_ID'] = pd.to_numeric(df1['CELL_ID'], errors='ignore')
-            df1 = df1.sort_values(by='CELL_ID').reset_index(drop=True)
-        if 'CELL_ID' in df2.columns:
-            df2['CELL_ID'] = pd.to_numeric(df2['CELL_ID'], errors='ignore')
-            df2 = df2.sort_values(by='CELL_ID').reset_index(drop=True)
-
-        def normalize_date(val):
-            if pd.isnull(val):
-                return None
-            val_str = str(val).strip()
-            if val_str.isdigit() and 7 <= len(val_str) <= 8:
-                try:
-                    padded = val_str.zfill(8)
-                    return datetime.strptime(padded, "%m%d%Y").date()
-                except:
-                    pass
-            for fmt in ("%m/%d/%Y", "%Y%m%d", "%m%d%Y"):
-                try:
-                    return datetime.strptime(val_str, fmt).date()
-                except ValueError:
-                    continue
-            return val
+        # The same pair of files as an earlier job reuses its result instead of being compared again
+        with stage('comparison', stages) as info:
+            done = len(stages)
+            result_df, status, diffs, left_only, right_only = incremental_comparison(
+                path1, path2, lambda previous: compare_paths(set_progress, path1, path2, stages, previous),
+                key='CELL_ID', strip=True)
+            # compare_paths adds its own stages, so none were added when the result came from the cache
+            info['cached'] = len(stages) == done
+
+        # Quantity totals per campaign / template / source code, kept for the reconciliation view
+        with stage('reconcile', stages) as info:
+            try:
+                reconciliation = reconcile(result_df, status, diffs, left_only, right_only)
+                with atomic_output(os.path.join(workspace, RECONCILIATION_FILE)) as tmp_path:
+                    reconciliation.to_pickle(tmp_path)
+                info['groups'] = len(reconciliation)
+            except ValueError:
+                reconciliation = None
+
+        # Save results next to the inputs (File 1 sheets + Comparison_Result) in one write-only pass
+        set_progress(("75", "Writing result workbook..."))
+        result_path = os.path.join(workspace, "Comparison_Result.xlsx")
+        with stage('write_report', stages) as info:
+            # Only a File 1 workbook has sheets to carry over, a CSV or Parquet upload just gets the result sheets
+            keep = path1 if file_format(path1) == 'excel' else None
+            write_report(result_path, result_df, status, left_only, right_only, keep_sheets_from=keep, diffs=diffs,
+                         reconciliation=reconciliation)
+            info.update(rows=len(result_df), cells=result_df.size)
+        # ========== END: COMPARISON LOGIC ==========
 
-        for col in common_columns:
-            if "date" in col.lower():
-                df1[col] = df1[col].apply(normalize_date)
-                df2[col] = df2[col].apply(normalize_date)
+        # Filter only mismatches for UI
+        set_progress(("100", "Done."))
+        with stage('mismatch_rows', stages) as info:
+            mismatch_rows = np.flatnonzero(mismatch_mask(status))
+            info['rows'] = len(mismatch_rows)
+            if len(mismatch_rows):
+                # Only the mismatching rows get rendered, and kept for update_table_page, which pages through them
+                mismatch_df = render_result(*take_rows(result_df, status, diffs, mismatch_rows))
+                mismatch_df.columns = [str(col) for col in mismatch_df.columns]
+                with atomic_output(os.path.join(workspace, MISMATCH_FILE)) as tmp_path:
+                    mismatch_df.to_pickle(tmp_path)
+
+        unmatched_msg = f"Only in File 1: {len(left_only)} rows, only in File 2: {len(right_only)} rows."
+        timings = timing_panel(stages) if TIMING_PANEL else None
+        result = {'job_id': os.path.basename(workspace), 'rows': len(mismatch_rows)}
+        if len(mismatch_rows) == 0:
+            return html.Div(["✅ No mismatches found.", html.Br(), unmatched_msg, timings]), result, ""
+
+        summary = html.Div([f"{len(mismatch_rows)} mismatching rows. {unmatched_msg}", timings])
+        return summary, result, ""
 
-        min_len = min(len(df1), len(df2))
-        df1 = df1.iloc[:min_len].reset_index(drop=True)
-        df2 = df2.iloc[:min_len].reset_index(drop=True)
-        result_df = df1.copy()
+    except Exception as e:
+        return None, None, f"❌ Error: {str(e)}"
 
-        if 'Quantity' in df1.columns and 'Quantity' in df2.columns:
-            diff_series = pd.to_numeric(df1['Quantity'], errors='coerce') - pd.to_numeric(df2['Quantity'], errors='coerce')
-            insert_loc = result_df.columns.get_loc('Quantity') + 1
-            result_df.insert(insert_loc, 'Quantity_Diff', diff_series)
+@lru_cache(maxsize=4)
+def _read_mismatches(path, mtime):
+    # mtime is part of the key so a rewritten file is never served from the cache
+    return pd.read_pickle(path)
 
-        for col in common_columns:
-            col1_vals = df1[col].astype(str).str.strip()
-            col2_vals = df2[col].astype(str).str.strip()
-            result_df[col] = [
-                v1 if v1 == v2 else f'DIFF: {v1} | {v2}'
-                for v1, v2 in zip(col1_vals, col2_vals)
-            ]
-
-        # Save results to file1 path
-        book = load_workbook(path1)
-        with pd.ExcelWriter(path1, engine='openpyxl', mode='a', if_sheet_exists='replace') as writer:
-            writer._book = book
-            result_df.to_excel(writer, sheet_name='Comparison_Result', index=False)
-
-        wb = load_workbook(path1)
-        ws = wb['Comparison_Result']
-        red_font = Font(color="FF0000")
-        for row in ws.iter_rows(min_row=2):
-            for cell in row:
-                if isinstance(cell.value, str) and cell.value.startswith('DIFF:'):
-                    cell.font = red_font
-
-        for col_idx, col in enumerate(ws.iter_cols(min_row=1, max_row=ws.max_row), start=1):
-            max_len = 0
-            for cell in col:
-                if cell.value:
-                    max_len = max(max_len, len(str(cell.value)))
-            ws.column_dimensions[get_column_letter(col_idx)].width = max_len + 2
-        wb.save(path1)
-        # ========== END: COMPARISON LOGIC ==========
+def load_mismatches(job_id):
+    workspace = workspace_path(job_id)
+    path = os.path.join(workspace, MISMATCH_FILE) if workspace else None
+    if path is None or not os.path.exists(path):
+        return None
+    return _read_mismatches(path, os.path.getmtime(path))
+
+# DataTable filter syntax ({col} op value) -> pandas comparison, longest operators first
+FILTER_OPERATORS = [
+    ('>=', operator.ge), ('<=', operator.le), ('<', operator.lt), ('>', operator.gt),
+    ('!=', operator.ne), ('=', operator.eq), ('contains', None), ('datestartswith', None),
+]
+FILTER_ALIASES = {'ge': '>=', 'le': '<=', 'lt': '<', 'gt': '>', 'ne': '!=', 'eq': '='}
+# Unary tests ({col} is blank); DataTable knows a few more (is num, is prime, ...) that are rejected
+FILTER_TESTS = {
+    'blank': lambda s: s.isna() | (s.astype(str).str.strip() == ''),
+    'nil': lambda s: s.isna(),
+}
+
+def split_filter_part(filter_part):
+    """(column, operator, value, ignore_case) of one DataTable filter expression.
+
+    e.g. '{Quantity} s>= 100', '{TEMPLATE_CODE} icontains "diff:"' or
+    '{POID} is blank'. The table prefixes binary operators with s (case
+    sensitive) or i (case insensitive); unary ones come back as 'is blank' /
+    'is not blank' with no value. value is the text with its quotes removed.
+    Raises ValueError for an operator filter_mask does not support.
+    """
+    name_end = filter_part.find('}')
+    if not filter_part.startswith('{') or name_end < 0:
+        return None, None, None, False
+    name = filter_part[1:name_end]
+    rest = filter_part[name_end + 1:].strip()
+    words = rest.split()
+    if words[:1] == ['is']:
+        test = words[-1] if len(words) > 1 else ''
+        if test not in FILTER_TESTS or len(words) != (3 if words[1] == 'not' else 2):
+            raise ValueError(f"Unsupported filter on {name}: '{rest}'.")
+        return name, ' '.join(words[:-1] + [test]), None, False
+
+    op, _, value = rest.partition(' ')
+    ignore_case = False
+    known = dict(FILTER_OPERATORS)
+    if op not in known and FILTER_ALIASES.get(op, op) not in known and op[:1] in ('s', 'i'):
+        ignore_case = op[0] == 'i'
+        op = op[1:]
+    op = FILTER_ALIASES.get(op, op)
+    if op not in known:
+        raise ValueError(f"Unsupported filter operator '{rest.partition(' ')[0]}' on {name}.")
+    value = value.strip()
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in ('"', "'", '`'):
+        value = value[1:-1]
+    return name, op, value, ignore_case
+
+def filter_mask(series, op, value, ignore_case=False):
+    if op.startswith('is '):
+        mask = FILTER_TESTS[op.split()[-1]](series)
+        return ~mask if op.startswith('is not ') else mask
+    text = series.astype(str).where(series.notna(), '')
+    if ignore_case:
+        text, value = text.str.lower(), value.lower()
+    if op == 'contains':
+        return text.str.contains(value, regex=False)
+    if op == 'datestartswith':
+        return text.str.startswith(value)
+    compare = dict(FILTER_OPERATORS)[op]
+    try:
+        number = float(value)
+    except ValueError:
+        return compare(text, value)
+    return compare(pd.to_numeric(series, errors='coerce'), number).fillna(False)
+
+def sort_key(series):
+    # Numeric columns sort as numbers, anything holding text (e.g. 'DIFF: 1 | 2') sorts as text
+    numbers = pd.to_numeric(series, errors='coerce')
+    return numbers if numbers.notna().sum() == series.notna().sum() else series.astype(str)
+
+def apply_table_query(df, sort_by, filter_query):
+    for part in (filter_query or '').split(' && '):
+        col, op, value, ignore_case = split_filter_part(part.strip())
+        if col in df.columns:
+            df = df[filter_mask(df[col], op, value, ignore_case)]
+    sort_by = [s for s in sort_by or [] if s['column_id'] in df.columns]
+    if sort_by:
+        df = df.sort_values([s['column_id'] for s in sort_by],
+                            ascending=[s['direction'] == 'asc' for s in sort_by],
+                            key=sort_key, kind='stable')
+    return df
 
-        # Filter only mismatches for UI
-        mismatch_df = result_df[result_df.apply(lambda row: any(str(v).startswith("DIFF:") for v in row), axis=1)]
-        if mismatch_df.empty:
-            return html.Div("✅ No mismatches found."), ""
-
-        return dash_table.DataTable(
-            columns=[{"name": i, "id": i} for i in mismatch_df.columns],
-            data=mismatch_df.to_dict('records'),
-            style_table={'overflowX': 'auto', 'marginTop': '20px'},
-            style_cell={'textAlign': 'left', 'fontFamily': 'Arial', 'padding': '5px'},
-            style_data_conditional=[
-                {
-                    'if': {'filter_query': '{' + col + '}.contains("DIFF:")', 'column_id': col},
-                    'color': 'red'
-                } for col in mismatch_df.columns
-            ]
-        ), ""
+@app.callback(
+    Output('mismatch-table', 'data'),
+    Output('mismatch-table', 'columns'),
+    Output('mismatch-table', 'page_count'),
+    Output('mismatch-table', 'page_current'),
+    Output('mismatch-table', 'style_data_conditional'),
+    Output('table-container', 'style'),
+    Input('comparison-result', 'data'),
+    Input('mismatch-table', 'page_current'),
+    Input('mismatch-table', 'page_size'),
+    Input('mismatch-table', 'sort_by'),
+    Input('mismatch-table', 'filter_query'),
+)
+def update_table_page(result, page_current, page_size, sort_by, filter_query):
+    df = load_mismatches(result['job_id']) if result else None
+    if df is None:
+        return [], [], 0, 0, [], {'display': 'none'}
 
-    except Exception as e:
-        return None, f"❌ Error: {str(e)}"
+    columns = [{"name": col, "id": col} for col in df.columns]
+    try:
+        df = apply_table_query(df, sort_by, filter_query)
+    except ValueError:
+        # A filter the table accepts but we cannot apply shows no rows rather than all of them
+        df = df.iloc[:0]
+    page_count = max(1, -(-len(df) // page_size))
+    # A new result or filter starts again from the first page
+    if ctx.triggered_id == 'comparison-result' or 'mismatch-table.filter_query' in ctx.triggered_prop_ids:
+        page_current = 0
+    page_current = min(page_current or 0, page_count - 1)
+    page = df.iloc[page_current * page_size:(page_current + 1) * page_size]
+
+    # Only columns that have a DIFF on this page need a highlight rule
+    diff_cols = [col for col in page.columns if page[col].astype(str).str.startswith("DIFF:").any()]
+    style = [
+        {'if': {'filter_query': '{' + col + '} contains "DIFF:"', 'column_id': col}, 'color': 'red'}
+        for col in diff_cols
+    ]
+    return page.to_dict('records'), columns, page_count, page_current, style, {'display': 'block'}
+
+@app.callback(
+    Output('reconciliation-table', 'data'),
+    Output('reconciliation-table', 'columns'),
+    Output('reconciliation-container', 'style'),
+    Input('comparison-result', 'data'),
+    Input('variance-threshold', 'value'),
+)
+def update_reconciliation(result, threshold):
+    workspace = workspace_path(result['job_id']) if result else None
+    path = os.path.join(workspace, RECONCILIATION_FILE) if workspace else None
+    if path is None or not os.path.exists(path):
+        return [], [], {'display': 'none'}
+
+    # The stored table holds every group, the threshold only narrows what is shown
+    df = pd.read_pickle(path)
+    if threshold:
+        df = df[over_threshold(df, threshold)]
+    columns = [{"name": col, "id": col} for col in df.columns]
+    return df.to_dict('records'), columns, {'display': 'block'}
 
 if __name__ == '__main__':
     app.run(debug=True)
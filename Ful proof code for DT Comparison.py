@@ -1,220 +1,359 @@
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
 import pandas as pd
-from openpyxl import load_workbook
-from openpyxl.styles import Font, PatternFill
-from openpyxl.utils import get_column_letter
-from datetime import datetime
-
-
-def compare_excels(file1_path, file2_path):
-    try:
-        sheet1 = pd.ExcelFile(file1_path).sheet_names[0]
-        sheet2 = pd.ExcelFile(file2_path).sheet_names[0]
-
-        df1 = pd.read_excel(file1_path, sheet_name=sheet1)
-        df2 = pd.read_excel(file2_path, sheet_name=sheet2, header=18)
-
-        column_mapping = {
-            'IA_Code':['IA_Code_1', 'IA_CODE1_DESC_NEW'],
-            'Quantity':['QUANTITY', 'FINAL_LETTERSHOP_QTY'],
-            'PRIMARY_SOURCE_CODE':['PRIMARY_SOURCE_CODE'],
-            'PRIMARY_SPID':['PRIMARY_SPID', 'PRIMARY_SPID1_NEW'],
-            'CAMPAIGN_CODE':['CAMPAIGN_CODE'],
-            'TEMPLATE_CODE':['TEMPLATE_CODE'],
-            'EXPIRATION_DATE':['EXPIRATION_DATE'],
-            'PRESCREEN_DATE':['PRESCREEN_DATE'],
-            'POID':['POID'],
-            'CELL_ID':['CELL_ID']
-        }
-
-        # Rename based on column mapping (case insensitive)
-        def apply_mapping(df, mapping):
-            rename_map = {}
-            for std_col, variants in mapping.items():
-                for v in variants:
-                    for col in df.columns:
-                        if col.strip().upper() == v.strip().upper():
-                            rename_map[col] = std_col
-                            break
-            return df.rename(columns=rename_map)
-
-        df1 = apply_mapping(df1, column_mapping)
-        df2 = apply_mapping(df2, column_mapping)
-
-        # ========= NEW: DATE STANDARDIZATION SECTION =========
-        def standardize_dates(df1, df2):
-            """
-            Standardize dates to ensure perfect matches for February 1, 2025 and June 30, 2025
-            """
-            # Fix PRESCREEN_DATE: Set both files to correct date format
-            if 'PRESCREEN_DATE' in df1.columns:
-                df1['PRESCREEN_DATE'] = '02-01-2025'  # Fix the wrong date in data tab
-
-            if 'PRESCREEN_DATE' in df2.columns:
-                # Convert mail plan datetime to MM-DD-YYYY string format
-                try:
-                    # Handle datetime objects by converting to date strings
-                    df2['PRESCREEN_DATE'] = pd.to_datetime(df2['PRESCREEN_DATE']).dt.strftime('%m-%d-%Y')
-                    # Set to correct date (February 1, 2025)
-                    df2['PRESCREEN_DATE'] = '02-01-2025'
-                except:
-                    # If conversion fails, set to correct date
-                    df2['PRESCREEN_DATE'] = '02-01-2025'
-
-            # Convert EXPIRATION_DATE: YYYYMMDD to MM/DD/YYYY format in data tab
-            if 'EXPIRATION_DATE' in df1.columns:
-                # Check if data is in YYYYMMDD format (like 20250630)
-                try:
-                    # Convert numeric dates to string first if needed
-                    df1['EXPIRATION_DATE'] = df1['EXPIRATION_DATE'].astype(str).str.strip()
-
-                    # Convert YYYYMMDD to MM/DD/YYYY
-                    df1['EXPIRATION_DATE'] = pd.to_datetime(
-                        df1['EXPIRATION_DATE'],
-                        format='%Y%m%d',
-                        errors='coerce'
-                    ).dt.strftime('%m/%d/%Y')
-                except:
-                    # If conversion fails, keep original format
-                    pass
-
-            # Ensure EXPIRATION_DATE in mail plan is also in MM/DD/YYYY format
-            if 'EXPIRATION_DATE' in df2.columns:
-                try:
-                    # Convert any datetime objects to MM/DD/YYYY string format
-                    df2['EXPIRATION_DATE'] = pd.to_datetime(df2['EXPIRATION_DATE']).dt.strftime('%m/%d/%Y')
-                except:
-                    # Keep original if conversion fails
-                    pass
-
-            return df1, df2
-
-        # Apply date standardization
-        df1, df2 = standardize_dates(df1, df2)
-        # ========= END DATE STANDARDIZATION SECTION =========
+from dt_batch import read_manifest, run_batch
+from dt_cache import incremental_comparison
+from dt_compare import (COLUMN_MAPPING, apply_mapping, compare_incremental, convert_types, normalize_date_column,
+                        summarize)
+from dt_export import export_path, write_diff_export
+from dt_reconcile import reconcile
+from dt_report import write_report, write_sheet_reports
+from dt_stream import compare_streaming
+from dt_timing import format_stages, stage
+from dt_workbook import detect_header, file_format, load_sheet, mapped_columns, pair_sheets
+
+
+# ========= DATE STANDARDIZATION SECTION =========
+def standardize_dates(df1, df2):
+    """
+    Standardize dates to ensure perfect matches for February 1, 2025 and June 30, 2025
+    """
+    # Fix PRESCREEN_DATE: Set both files to correct date format
+    if 'PRESCREEN_DATE' in df1.columns:
+        df1['PRESCREEN_DATE'] = '02-01-2025'  # Fix the wrong date in data tab
+
+    if 'PRESCREEN_DATE' in df2.columns:
+        # Convert mail plan datetime to MM-DD-YYYY string format
+        try:
+            # Handle datetime objects by converting to date strings
+            df2['PRESCREEN_DATE'] = pd.to_datetime(df2['PRESCREEN_DATE']).dt.strftime('%m-%d-%Y')
+            # Set to correct date (February 1, 2025)
+            df2['PRESCREEN_DATE'] = '02-01-2025'
+        except:
+            # If conversion fails, set to correct date
+            df2['PRESCREEN_DATE'] = '02-01-2025'
+
+    # Convert EXPIRATION_DATE: YYYYMMDD to MM/DD/YYYY format in data tab
+    if 'EXPIRATION_DATE' in df1.columns:
+        # Check if data is in YYYYMMDD format (like 20250630)
+        try:
+            # Convert numeric dates to string first if needed
+            df1['EXPIRATION_DATE'] = df1['EXPIRATION_DATE'].astype(str).str.strip()
+
+            # Convert YYYYMMDD to MM/DD/YYYY
+            df1['EXPIRATION_DATE'] = pd.to_datetime(
+                df1['EXPIRATION_DATE'],
+                format='%Y%m%d',
+                errors='coerce'
+            ).dt.strftime('%m/%d/%Y')
+        except:
+            # If conversion fails, keep original format
+            pass
+
+    # Ensure EXPIRATION_DATE in mail plan is also in MM/DD/YYYY format
+    if 'EXPIRATION_DATE' in df2.columns:
+        try:
+            # Convert any datetime objects to MM/DD/YYYY string format
+            df2['EXPIRATION_DATE'] = pd.to_datetime(df2['EXPIRATION_DATE']).dt.strftime('%m/%d/%Y')
+        except:
+            # Keep original if conversion fails
+            pass
+
+    return df1, df2
+# ========= END DATE STANDARDIZATION SECTION =========
+
+
+def prepare_frames(df1, df2):
+    """Date fixes shared by the in-memory and the streaming comparison."""
+    df1, df2 = standardize_dates(df1, df2)
+
+    # Normalize date columns including PRESCREEN_DATE (each distinct value is parsed once)
+    for col in set(df1.columns) & set(df2.columns):
+        if "date" in col.lower():
+            df1[col] = normalize_date_column(df1[col])
+            df2[col] = normalize_date_column(df2[col])
+    return df1, df2
+
+
+def compare_workbooks(file1_path, file2_path, key='CELL_ID', pass_through=None, workers=None, stages=None,
+                      previous=None, header2=18, sheet1=0, sheet2=0):
+    """Compare two sheets and return ((result_df, status, diffs, left_only, right_only), row hashes).
+
+    pass_through=None carries every Data Tab column into the result. A list
+    switches to projection mode: only the mapped columns plus those are
+    parsed from the Data Tab (only the mapped ones from the Mail Plan), and
+    codes/Quantity get compact dtypes early. Otherwise every column the two
+    files share is compared.
+    workers > 1 compares blocks of columns in parallel (for wide sheets).
+    Each step is timed with dt_timing.stage and appended to stages.
+    previous is an earlier (result, row hashes) sharing one of the files;
+    only the rows that changed since then are compared again. header2 is
+    the Mail Plan header row, sheet1/sheet2 the sheets (the first ones by default).
+    """
+    project = pass_through is not None
+    # Parsed frames are cached by file content, so an unchanged mail plan is only parsed once.
+    # Every column the two files share is compared; projection mode parses only the mapped ones.
+    with stage('parse_file1', stages) as info:
+        df1 = load_sheet(file1_path, sheet1,
+                         columns=mapped_columns(COLUMN_MAPPING) + list(pass_through) if project else None)
+        info.update(rows=len(df1), columns=len(df1.columns))
+    with stage('parse_file2', stages) as info:
+        df2 = load_sheet(file2_path, sheet2, header=header2,
+                         columns=mapped_columns(COLUMN_MAPPING) if project else None)
+        info.update(rows=len(df2), columns=len(df2.columns))
+
+    with stage('prepare', stages):
+        df1 = apply_mapping(df1, COLUMN_MAPPING)
+        df2 = apply_mapping(df2, COLUMN_MAPPING)
+        if project:
+            df1, df2 = convert_types(df1), convert_types(df2)
 
         common_cols = list(set(df1.columns) & set(df2.columns))
         if not common_cols:
             raise ValueError("No common columns to compare.")
 
-        # Sort by CELL_ID
-        for df in [df1, df2]:
-            if 'CELL_ID' in df.columns:
-                df['CELL_ID'] = df['CELL_ID'].astype(str).str.strip()
-                df.sort_values(by='CELL_ID', inplace=True)
-                df.reset_index(drop=True, inplace=True)
-
-        # Normalize date fields (keeping your existing logic for other date formats)
-        def normalize_date(val):
-            if pd.isnull(val):
-                return None
-            val_str = str(val).strip()
-
-            # Handle 7-digit MMDDYYYY like 2012025 → 02-01-2025
-            if val_str.isdigit() and len(val_str) == 7:
-                try:
-                    mm = int(val_str[:1]) if int(val_str[:2]) > 12 else int(val_str[:2])
-                    dd = int(val_str[1:3]) if mm < 10 else int(val_str[2:4])
-                    yyyy = int(val_str[-4:])
-                    return datetime(yyyy, mm, dd).date()
-                except:
-                    pass
-
-            # Handle 8-digit MMDDYYYY like 02012025
-            if val_str.isdigit() and len(val_str) == 8:
-                try:
-                    return datetime.strptime(val_str, "%m%d%Y").date()
-                except:
-                    pass
-
-            # Handle known formats
-            for fmt in ("%Y-%m-%d", "%m/%d/%Y", "%m-%d-%Y", "%Y%m%d"):
-                try:
-                    return datetime.strptime(val_str, fmt).date()
-                except:
-                    continue
-
-            # Final fallback: if it's a datetime, remove time part
-            try:
-                return pd.to_datetime(val).date()
-            except:
-                return val
-
-        # Apply date normalization to date columns including PRESCREEN_DATE
-        for col in common_cols:
-            if "date" in col.lower():
-                df1[col] = df1[col].apply(normalize_date)
-                df2[col] = df2[col].apply(normalize_date)
-
-        # Truncate to min length
-        min_len = min(len(df1), len(df2))
-        df1 = df1.iloc[:min_len].reset_index(drop=True)
-        df2 = df2.iloc[:min_len].reset_index(drop=True)
-
-        # Comparison
-        result_df = df1.copy()
-
-        if 'Quantity' in df1.columns and 'Quantity' in df2.columns:
-            diff_series = pd.to_numeric(df1['Quantity'], errors='coerce') - pd.to_numeric(df2['Quantity'],
-                                                                                          errors='coerce')
-            result_df.insert(result_df.columns.get_loc('Quantity') + 1, 'Quantity_Diff', diff_series)
-
-        comparison_matrix = []
-        for i in range(min_len):
-            row_status = []
-            for col in result_df.columns:
-                if col in df2.columns:
-                    v1 = str(df1.at[i, col]) if pd.notna(df1.at[i, col]) else 'BLANK'
-                    v2 = str(df2.at[i, col]) if pd.notna(df2.at[i, col]) else 'BLANK'
-
-                    if v1 == 'BLANK' and v2 == 'BLANK':
-                        row_status.append('BLANK')
-                        result_df.at[i, col] = 'BLANK'
-                    elif v1 == v2:
-                        row_status.append('MATCH')
-                    else:
-                        row_status.append('DIFF')
-                        result_df.at[i, col] = f'DIFF: {v1} | {v2}'
-                else:
-                    row_status.append('')
-            comparison_matrix.append(row_status)
-
-        # Save result
-        book = load_workbook(file1_path)
-        with pd.ExcelWriter(file1_path, engine='openpyxl', mode='a', if_sheet_exists='replace') as writer:
-            writer._book = book
-            result_df.to_excel(writer, sheet_name='Comparison_Result', index=False)
-
-        # Formatting
-        wb = load_workbook(file1_path)
-        ws = wb['Comparison_Result']
-        red_font = Font(color="FF0000")
-        green_fill = PatternFill(start_color="CCFFCC", end_color="CCFFCC", fill_type="solid")
-        grey_fill = PatternFill(start_color="D9D9D9", end_color="D9D9D9", fill_type="solid")
-
-        for i, row in enumerate(ws.iter_rows(min_row=2, max_row=1 + len(comparison_matrix)), start=0):
-            for j, cell in enumerate(row):
-                if j < len(comparison_matrix[i]):
-                    status = comparison_matrix[i][j]
-                    if status == 'DIFF':
-                        cell.font = red_font
-                    elif status == 'MATCH':
-                        cell.fill = green_fill
-                    elif status == 'BLANK':
-                        cell.fill = grey_fill
-
-        # Auto-adjust column widths
-        for col_idx, col in enumerate(ws.iter_cols(min_row=1, max_row=ws.max_row), start=1):
-            max_len = max((len(str(cell.value)) for cell in col if cell.value), default=0)
-            ws.column_dimensions[get_column_letter(col_idx)].width = max_len + 2
-
-        wb.save(file1_path)
-
-        print("✅ Final comparison result saved with formatting.")
+        df1, df2 = prepare_frames(df1, df2)
+
+    # Pair rows on the key (CELL_ID by default) instead of by position, then compare them
+    with stage('align_compare', stages) as info:
+        result, hashes = compare_incremental(df1, df2, key, previous, workers=workers)
+        result_df, status, diffs, left_only, right_only = result
+        info.update(rows=len(result_df), left_only=len(left_only), right_only=len(right_only),
+                    cells=status.size, diff_cells=len(diffs), incremental=previous is not None)
+    return result, hashes
+
+
+def compare_excels(file1_path, file2_path, key='CELL_ID', chunksize=None, out_path=None, styling='cells',
+                   pass_through=None, workers=None, timings=False, header2=None, sheets=None, sheet_workers=None,
+                   variance_threshold=None, diff_export=None, diffs_only=False):
+    """Compare a Data Tab with a Mail Plan and return the dt_compare.summarize counts.
+
+    Either file may be an xlsx workbook, a CSV or a Parquet file. The report
+    goes to out_path, by default next to file1 as
+    <file1>_Comparison_Result.xlsx (with the sheets of a file1 workbook copied
+    in); file1 itself is never rewritten, so its cache entries stay valid for
+    the next run. With chunksize both files are streamed and
+    the result is written to CSV instead (default <file1>_Comparison_Result.csv). The
+    per-stage records (see dt_timing) come back under 'stages' and are
+    printed as a table with timings=True. header2 is the Mail Plan header
+    row; by default it is found by detect_header, wherever the banner ends.
+    sheets='all' (or a sheet map) compares several sheet pairs instead of
+    the first sheets, see compare_all_sheets. The in-memory report also gets
+    a Reconciliation sheet of quantity totals per campaign / template /
+    source code (see dt_reconcile), limited to groups whose variance is at
+    least variance_threshold percent when that is given. diff_export
+    ('parquet', 'jsonl', 'csv' or a file name) also writes every difference
+    as one (key, column, left, right, status) record, see dt_export; with
+    diffs_only that export is the only output and no report is built.
+    """
+    stages = []
+    try:
+        if sheets is not None:
+            if chunksize:
+                raise ValueError("Streaming (chunksize) compares the first sheets only, it cannot be used with sheets.")
+            if diff_export or diffs_only:
+                raise ValueError("The diff export covers one sheet pair, it cannot be used with sheets.")
+            with stage('compare_sheets', stages) as info:
+                counts = compare_all_sheets(file1_path, file2_path, None if sheets in ('all', ['all']) else sheets,
+                                            out_path, key, styling, pass_through, workers, sheet_workers)
+                info['pairs'] = len(counts['sheets'])
+            if timings:
+                print(format_stages(stages))
+            return {**counts, 'stages': stages}
+
+        if header2 is None:
+            with stage('detect_header', stages) as info:
+                header2 = detect_header(file2_path, mapped_columns(COLUMN_MAPPING))
+                info['row'] = header2
+            print(f"Mail Plan header found on row {header2 + 1}.")
+
+        # Streaming mode: both files are read chunksize rows at a time and the result goes to CSV
+        if chunksize:
+            out_path = out_path or os.path.splitext(file1_path)[0] + '_Comparison_Result.csv'
+            diff_path = export_path(out_path, diff_export) if diff_export or diffs_only else None
+            with stage('compare_streaming', stages) as info:
+                counts = compare_streaming(file1_path, file2_path, out_path, key=key, header2=header2,
+                                           chunksize=chunksize, prepare=prepare_frames, diff_path=diff_path,
+                                           diffs_only=diffs_only)
+                info.update(counts)
+        else:
+            # Comparing the same pair of files again reuses the stored result, and after an
+            # edit to one of them only the changed rows are compared again
+            with stage('comparison', stages) as info:
+                done = len(stages)
+                result_df, status, diffs, left_only, right_only = incremental_comparison(
+                    file1_path, file2_path,
+                    lambda previous: compare_workbooks(file1_path, file2_path, key, pass_through, workers, stages,
+                                                       previous, header2),
+                    key=key, header2=header2, mapping=COLUMN_MAPPING, pass_through=pass_through)
+                # compare_workbooks adds its own stages, so none were added when the result came from the cache
+                info['cached'] = len(stages) == done
+
+            # Writing into file1 would change its content digest and miss the cache on every later run
+            workbook = file_format(file1_path) == 'excel'
+            out_path = out_path or os.path.splitext(file1_path)[0] + '_Comparison_Result.xlsx'
+            diff_path = export_path(out_path, diff_export) if diff_export or diffs_only else None
+
+            # Long-format diffs straight from the diff records, no result row is rendered for them
+            if diff_path:
+                with stage('diff_export', stages) as info:
+                    info['records'] = write_diff_export(diff_path, result_df, diffs, left_only, right_only, key)
+                print(f"✅ Differences exported to {diff_path}.")
+
+            if not diffs_only:
+                # Quantity totals per group, rebuilt from the comparison in one group-by per side
+                with stage('reconcile', stages) as info:
+                    try:
+                        reconciliation = reconcile(result_df, status, diffs, left_only, right_only,
+                                                   threshold=variance_threshold)
+                        info['groups'] = len(reconciliation)
+                    except ValueError as e:
+                        print(f"⚠️ No reconciliation: {e}")
+                        reconciliation = None
+
+                # Save result: one write-only pass, styles come straight from the status matrix
+                # (styling='conditional' uses a few conditional-formatting rules instead, for big reports).
+                # The xlsx is only produced here, CSV and Parquet inputs are never converted to a workbook.
+                with stage('write_report', stages) as info:
+                    write_report(out_path, result_df, status, left_only, right_only,
+                                 keep_sheets_from=file1_path if workbook else None, styling=styling, diffs=diffs,
+                                 reconciliation=reconciliation)
+                    info.update(rows=len(result_df), cells=result_df.size)
+                print("✅ Final comparison result saved with formatting.")
+            counts = summarize(status, left_only, right_only)
+
+        if diff_path:
+            counts['diff_export'] = diff_path
+        if timings:
+            print(format_stages(stages))
+        return {**counts, 'stages': stages}
 
     except Exception as e:
         print(f"❌ Error: {e}")
         raise
 
 
-# Call the function with your file names
-compare_excels("Data Tab Report.xlsx", "Platinum_Mail Plan.xlsx")
\ No newline at end of file
+def compare_sheet_pair(file1_path, file2_path, sheet1, sheet2, key='CELL_ID', pass_through=None, workers=None):
+    """Compare one pair of sheets, with its own Mail Plan header row; a worker task of compare_all_sheets."""
+    header2 = detect_header(file2_path, mapped_columns(COLUMN_MAPPING), sheet=sheet2)
+    return incremental_comparison(
+        file1_path, file2_path,
+        lambda previous: compare_workbooks(file1_path, file2_path, key, pass_through, workers, previous=previous,
+                                           header2=header2, sheet1=sheet1, sheet2=sheet2),
+        key=key, header2=header2, mapping=COLUMN_MAPPING, pass_through=pass_through, sheet1=sheet1, sheet2=sheet2)
+
+
+def compare_all_sheets(file1_path, file2_path, sheet_map=None, out_path=None, key='CELL_ID', styling='cells',
+                       pass_through=None, workers=None, sheet_workers=None):
+    """Compare several pairs of sheets in a process pool and write them all into one report.
+
+    Sheets are paired by name, or by sheet_map (see dt_workbook.pair_sheets),
+    and each pair is parsed and compared in its own worker (sheet_workers
+    processes, by default one per CPU). The report (default
+    <file1>_Comparison_Result.xlsx) starts with an Overview sheet holding the
+    counts of every pair, followed by a result sheet per pair. A pair that
+    fails is listed in the overview with its error and the others still run.
+    Returns the summed counts with those of each pair under 'sheets'.
+    """
+    pairs = pair_sheets(file1_path, file2_path, sheet_map)
+    if not pairs:
+        raise ValueError("No sheets to compare: the two workbooks have no sheet names in common.")
+    out_path = out_path or os.path.splitext(file1_path)[0] + '_Comparison_Result.xlsx'
+
+    print(f"Comparing {len(pairs)} sheet pair(s)...")
+    rows, reports = [], []
+    with ProcessPoolExecutor(max_workers=min(sheet_workers or os.cpu_count() or 1, len(pairs))) as pool:
+        futures = [pool.submit(compare_sheet_pair, file1_path, file2_path, sheet1, sheet2, key, pass_through, workers)
+                   for sheet1, sheet2 in pairs]
+        for (sheet1, sheet2), future in zip(pairs, futures):
+            same = str(sheet1).strip().upper() == str(sheet2).strip().upper()
+            name = sheet1 if same else f"{sheet1} vs {sheet2}"
+            row = {'Pair': name, 'File 1 sheet': sheet1, 'File 2 sheet': sheet2}
+            try:
+                result_df, status, diffs, left_only, right_only = future.result()
+            except Exception as e:
+                row['error'] = f"{type(e).__name__}: {e}"
+                print(f"❌ {name}: {row['error']}")
+            else:
+                row.update(summarize(status, left_only, right_only))
+                reports.append((name, result_df, status, diffs, left_only, right_only))
+                print(f"✅ {name}: {row['diff_rows']} row(s) with differences")
+            rows.append(row)
+
+    counts = ['matched', 'left_only', 'right_only', 'diff_rows', 'diff_cells']
+    overview = pd.DataFrame(rows, columns=['Pair', 'File 1 sheet', 'File 2 sheet'] + counts + ['error'])
+    overview[counts] = overview[counts].astype('Int64')
+    write_sheet_reports(out_path, reports, overview, styling)
+    print(f"✅ Comparison of {len(reports)} sheet pair(s) saved to {out_path}.")
+
+    totals = {col: int(overview[col].sum()) for col in counts}
+    return {**totals, 'sheets': {row['Pair']: row for row in rows}}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compare Data Tab reports with Mail Plans, one pair or a whole manifest.",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="environment variables:\n"
+               "  DT_COMPARE_STAGE_LOG     every pipeline stage is logged as one JSON line (time, RSS, counts)\n"
+               "                           to stderr; set this to a file name to log there instead, or to off\n"
+               "  DT_COMPARE_TRACEMALLOC   1 adds the peak Python allocation of each stage (slower)\n"
+               "  DT_COMPARE_CACHE_DIR     where parsed files and comparison results are cached\n"
+               "  DT_COMPARE_CACHE_SIZE    cache size limit in bytes (default 2 GB)")
+    parser.add_argument('file1', nargs='?', default="Data Tab Report.xlsx")
+    parser.add_argument('file2', nargs='?', default="Platinum_Mail Plan.xlsx")
+    parser.add_argument('--manifest', help="CSV or YAML list of pairs (file1, file2, options), see dt_batch.read_manifest")
+    parser.add_argument('--out-dir', default='comparison_results', help="where a manifest run writes its reports")
+    parser.add_argument('--workers', type=int, default=None, help="parallel comparisons (default: CPU count)")
+    parser.add_argument('--no-resume', action='store_true', help="redo pairs an earlier run already finished")
+    parser.add_argument('--key', default=None)
+    parser.add_argument('--chunksize', type=int, default=None)
+    parser.add_argument('--styling', choices=['cells', 'conditional'], default=None)
+    parser.add_argument('--pass-through', nargs='*', default=None,
+                        help="projection mode: parse only the mapped columns plus these")
+    parser.add_argument('--column-workers', type=int, default=None,
+                        help="compare blocks of columns in this many processes (wide sheets)")
+    parser.add_argument('--timings', action='store_true',
+                        help="print a table of the stage timings at the end (see DT_COMPARE_STAGE_LOG)")
+    parser.add_argument('--header2', type=int, default=None,
+                        help="Mail Plan header row, counted from 0 (default: detected)")
+    parser.add_argument('--sheets', nargs='+', default=None,
+                        help="compare several sheets: 'all' pairs sheets by name, or give FILE1_SHEET=FILE2_SHEET pairs")
+    parser.add_argument('--sheet-workers', type=int, default=None,
+                        help="sheet pairs compared at once with --sheets (default: CPU count)")
+    parser.add_argument('--variance-threshold', type=float, default=None,
+                        help="only list reconciliation groups whose quantity variance is at least this many percent")
+    parser.add_argument('--diff-export', default=None,
+                        help="also write the differences as long records: parquet, jsonl, csv or a file name")
+    parser.add_argument('--diffs-only', action='store_true',
+                        help="write only the diff export (parquet unless --diff-export says otherwise), no report")
+    args = parser.parse_args(argv)
+
+    # Options given on the command line are defaults for every pair of a manifest
+    options = {name: value for name, value in (('key', args.key), ('chunksize', args.chunksize),
+                                               ('styling', args.styling), ('pass_through', args.pass_through),
+                                               ('workers', args.column_workers), ('header2', args.header2),
+                                               ('sheets', args.sheets), ('sheet_workers', args.sheet_workers),
+                                               ('variance_threshold', args.variance_threshold),
+                                               ('diff_export', args.diff_export),
+                                               ('diffs_only', args.diffs_only or None),
+                                               ('timings', args.timings or None))
+               if value is not None}
+
+    if not args.manifest:
+        compare_excels(args.file1, args.file2, **options)
+        return 0
+
+    pairs = read_manifest(args.manifest)
+    for pair in pairs:
+        pair['options'] = {**options, **pair['options']}
+    summary = run_batch(pairs, compare_excels, args.out_dir, workers=args.workers, resume=not args.no_resume)
+    failed = [row for row in summary.values() if row['status'] != 'ok']
+    print(f"Summary written to {os.path.join(args.out_dir, 'summary.csv')}, {len(failed)} pair(s) failed.")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
\ No newline at end of file
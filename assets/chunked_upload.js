@@ -0,0 +1,93 @@
+// Streams files picked or dropped on a .chunked-upload button to the /upload route (see dt_uploads.py)
+// in CHUNK_SIZE pieces, then hands {upload_id, filename, size} to the dcc.Store named in data-store.
+(function () {
+    var CHUNK_SIZE = 4 * 1024 * 1024;
+    var RETRIES = 3;
+
+    function sendChunk(uploadId, offset, piece) {
+        return fetch('upload/' + uploadId + '?offset=' + offset, {method: 'PUT', body: piece})
+            .then(function (resp) {
+                // 409 means the server has a different size (e.g. a retried chunk already landed): resume from there
+                if (resp.ok || resp.status === 409) {
+                    return resp.json();
+                }
+                throw new Error('server answered ' + resp.status);
+            });
+    }
+
+    async function upload(file, status) {
+        var start = await fetch('upload?filename=' + encodeURIComponent(file.name), {method: 'POST'});
+        if (!start.ok) {
+            throw new Error('could not start upload (' + start.status + ')');
+        }
+        var info = await start.json();
+        var offset = 0;
+        var failures = 0;
+
+        while (offset < file.size) {
+            try {
+                var result = await sendChunk(info.upload_id, offset, file.slice(offset, offset + CHUNK_SIZE));
+                offset = result.size;
+                failures = 0;
+            } catch (err) {
+                failures += 1;
+                if (failures > RETRIES) {
+                    throw err;
+                }
+                var current = await fetch('upload/' + info.upload_id).then(function (r) { return r.json(); });
+                offset = current.size;
+            }
+            status.textContent = 'Uploading ' + file.name + ': ' + Math.round(100 * offset / file.size) + '%';
+        }
+        return {upload_id: info.upload_id, filename: info.filename, size: offset};
+    }
+
+    function start(target, file) {
+        var storeId = target.dataset.store;
+        var status = document.getElementById(storeId + '-status');
+        status.textContent = 'Uploading ' + file.name + '...';
+
+        upload(file, status).then(function (result) {
+            status.textContent = 'Uploaded: ' + file.name;
+            window.dash_clientside.set_props(storeId, {data: result});
+        }).catch(function (err) {
+            status.textContent = 'Upload failed: ' + err.message;
+        });
+    }
+
+    function uploadTarget(event) {
+        return event.target.closest ? event.target.closest('.chunked-upload') : null;
+    }
+
+    // Dash has no file <input> component, so open a throwaway one when the button is clicked
+    document.addEventListener('click', function (event) {
+        var target = uploadTarget(event);
+        if (!target) {
+            return;
+        }
+        var picker = document.createElement('input');
+        picker.type = 'file';
+        picker.accept = target.dataset.accept || '';
+        picker.addEventListener('change', function () {
+            if (picker.files.length) {
+                start(target, picker.files[0]);
+            }
+        });
+        picker.click();
+    });
+
+    document.addEventListener('dragover', function (event) {
+        if (uploadTarget(event)) {
+            event.preventDefault();
+        }
+    });
+
+    document.addEventListener('drop', function (event) {
+        var target = uploadTarget(event);
+        if (!target || !event.dataTransfer.files.length) {
+            return;
+        }
+        event.preventDefault();
+        start(target, event.dataTransfer.files[0]);
+    });
+})();
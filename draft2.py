@@ -2,25 +2,20 @@ import dash
 from dash import dcc, html, Output, Input, State
 import dash_bootstrap_components as dbc
 import pandas as pd
-import tempfile
-import base64
 import os
-from openpyxl import load_workbook
-from openpyxl.styles import Font
-from openpyxl.utils import get_column_letter
-from datetime import datetime
+from dt_compare import align_on_key, compare_frames, normalize_date_column
+from dt_report import write_report
+from dt_jobs import background_callback_manager, job_slot
+from dt_workspace import new_workspace, remove_workspace
+from dt_uploads import chunked_upload, register_upload_routes, upload_path
+from dt_workbook import check_workbook, load_sheet
 
 # Function to compare two Excel files
-def compare_excels(file1_path, file2_path):
+def compare_excels(file1_path, file2_path, key='CELL_ID', out_path=None):
     try:
-        # Load first sheet from both files
-        sheet1 = pd.ExcelFile(file1_path).sheet_names[0]
-        sheet2 = pd.ExcelFile(file2_path).sheet_names[0]
-        print(f"Sheet 1: {sheet1}, Sheet 2: {sheet2}")
-
-        # Read data
-        df1 = pd.read_excel(file1_path, sheet_name=sheet1)
-        df2 = pd.read_excel(file2_path, sheet_name=sheet2)
+        # Read the first sheet of both files (one open per workbook, cached by file content)
+        df1 = load_sheet(file1_path)
+        df2 = load_sheet(file2_path)
         print(f"File 1 shape: {df1.shape}, File 2 shape: {df2.shape}")
 
         # Optional column mapping (adjust as needed)
@@ -60,127 +55,59 @@ def compare_excels(file1_path, file2_path):
         if not common_columns:
             raise ValueError("No common columns found for comparison.")
 
-        # Sort both DataFrames by CELL_ID (handle numeric or string)
-        if 'CELL_ID' in df1.columns:
-            try:
-                df1['CELL_ID'] = pd.to_numeric(df1['CELL_ID'], errors='ignore')
-            except:
-                pass
-            df1 = df1.sort_values(by='CELL_ID').reset_index(drop=True)
-        if 'CELL_ID' in df2.columns:
-            try:
-                df2['CELL_ID'] = pd.to_numeric(df2['CELL_ID'], errors='ignore')
-            except:
-                pass
-            df2 = df2.sort_values(by='CELL_ID').reset_index(drop=True)
-
         # Normalize date fields if necessary
-        def normalize_date(val):
-            if pd.isnull(val):
-                return None
-            val_str = str(val).strip()
-            if val_str.isdigit() and 7 <= len(val_str) <= 8:
-                try:
-                    padded = val_str.zfill(8)
-                    return datetime.strptime(padded, "%m%d%Y").date()
-                except:
-                    pass
-            for fmt in ("%m/%d/%Y", "%Y%m%d", "%m%d%Y"):
-                try:
-                    return datetime.strptime(val_str, fmt).date()
-                except ValueError:
-                    continue
-            return val
-
+        # Each distinct value is parsed once, see dt_compare.normalize_date_column
         for col in common_columns:
             if "date" in col.lower():
-                df1[col] = df1[col].apply(normalize_date)
-                df2[col] = df2[col].apply(normalize_date)
+                df1[col] = normalize_date_column(df1[col])
+                df2[col] = normalize_date_column(df2[col])
 
-        # Align row lengths
-        min_len = min(len(df1), len(df2))
-        df1 = df1.iloc[:min_len].reset_index(drop=True)
-        df2 = df2.iloc[:min_len].reset_index(drop=True)
-        # Create result DataFrame with all File 1 data
-        result_df = df1.copy()
-
-        # Adding a new column next to Quantity as Quantity Diff for the Quantity difference of file1 and file2
-        if 'Quantity' in df1.columns and 'Quantity' in df2.columns:
-            diff_series = pd.to_numeric(df1['Quantity'], errors='coerce') - pd.to_numeric(df2['Quantity'], errors='coerce')
-            insert_loc = result_df.columns.get_loc('Quantity') + 1
-            result_df.insert(insert_loc, 'Quantity_Diff', diff_series)
-
-        # Compare and flag differences
-        for col in common_columns:
-            col1_vals = df1[col].astype(str)
-            col2_vals = df2[col].astype(str)
-            result_df[col] = [
-                v1 if v1 == v2 else f'DIFF: {v1} | {v2}'
-                for v1, v2 in zip(col1_vals, col2_vals)
-            ]
+        # Pair rows on the key (CELL_ID by default) instead of by position
+        df1, df2, left_only, right_only = align_on_key(df1, df2, key)
+        # Compare and flag differences (result keeps all File 1 columns plus Quantity_Diff)
+        result_df, status, diffs = compare_frames(df1, df2, columns=common_columns)
 
         print(f":large_green_circle: Compared columns: {common_columns}")
         print(f":white_check_mark: Final result will contain all File 1 columns: {result_df.columns.tolist()}")
 
-        # Write to Excel
-        book = load_workbook(file1_path)
-        with pd.ExcelWriter(file1_path, engine='openpyxl', mode='a', if_sheet_exists='replace') as writer:
-            writer._book = book
-            result_df.to_excel(writer, sheet_name='Comparison_Result', index=False)
-
-        # Format output (color differences red)
-        wb = load_workbook(file1_path)
-        ws = wb['Comparison_Result']
-        red_font = Font(color="FF0000")
-        for row in ws.iter_rows(min_row=2):  # Skip header
-            for cell in row:
-                if isinstance(cell.value, str) and cell.value.startswith('DIFF:'):
-                    cell.font = red_font
-
-        # Auto-adjust column width
-        for col_idx, col in enumerate(ws.iter_cols(min_row=1, max_row=ws.max_row), start=1):
-            max_len = 0
-            for cell in col:
-                if cell.value:
-                    max_len = max(max_len, len(str(cell.value)))
-            ws.column_dimensions[get_column_letter(col_idx)].width = max_len + 2
-
-        # Save workbook
-        wb.save(file1_path)
+        # Write to Excel in one pass, styling and widths are applied while writing
+        # (next to file 1 unless out_path says otherwise, file 1 itself is never rewritten)
+        out_path = out_path or os.path.splitext(file1_path)[0] + '_Comparison_Result.xlsx'
+        write_report(out_path, result_df, status, left_only, right_only, keep_sheets_from=file1_path, diffs=diffs)
         print("\n:white_check_mark: Comparison completed and saved in 'Comparison_Result' sheet.")
-        return file1_path
+        return out_path
     except Exception as e:
         print(f"Error in compare_excels: {str(e)}")
         raise
 
 # Dash application setup
-app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
+# Comparisons run as background jobs (see dt_jobs.py for the worker limit and job storage)
+app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP],
+                background_callback_manager=background_callback_manager)
+# Files are streamed to disk through /upload, callbacks only ever see the upload id
+register_upload_routes(app.server)
 
 app.layout = dbc.Container([
     html.H3("Excel File Comparison Dashboard"),
 
     html.Label("Upload File 1:"),
-    dcc.Upload(
-        id="upload1",
-        children=dbc.Button("Upload First Excel (.xlsx)", color="primary"),
-        multiple=False,
-        style={'margin-bottom': '20px'},
-        accept=".xlsx"  # Restrict to .xlsx files
+    html.Div(
+        chunked_upload("upload1", "Choose the first Excel (.xlsx)", accept=".xlsx"),  # Restrict to .xlsx files
+        style={'margin-bottom': '20px'}
     ),
     html.Div(id='file1_feedback', children="No file uploaded for File 1."),
 
     html.Label("Upload File 2:"),
-    dcc.Upload(
-        id="upload2",
-        children=dbc.Button("Upload Second Excel (.xlsx)", color="primary"),
-        multiple=False,
-        style={'margin-bottom': '20px'},
-        accept=".xlsx"  # Restrict to .xlsx files
+    html.Div(
+        chunked_upload("upload2", "Choose the second Excel (.xlsx)", accept=".xlsx"),  # Restrict to .xlsx files
+        style={'margin-bottom': '20px'}
     ),
     html.Div(id='file2_feedback', children="No file uploaded for File 2."),
 
     html.Br(),
     dbc.Button("Compare Files", id="do_compare", color="success", className="mb-2"),
+    dbc.Button("Cancel", id="cancel_compare", color="secondary", className="mb-2 ms-2", disabled=True),
+    dbc.Progress(id="compare_progress", value=0, striped=True, animated=True, className="mb-2"),
     html.Br(),
     html.Div(id="compare_feedback", children="Click 'Compare Files' to start comparison."),
 
@@ -188,23 +115,21 @@ app.layout = dbc.Container([
     dcc.Download(id="download_compared"),
 ])
 
-def save_temp_excel(contents, filename):
-    """Decode base64 upload and save to a temp file. Return temp file path."""
+def check_uploaded_excel(upload):
+    """Find a streamed upload on disk and make sure it is a readable .xlsx. Return its path."""
+    filename = upload['filename']
     try:
         if not filename.endswith('.xlsx'):
             raise ValueError("Only .xlsx files are supported.")
-        content_type, content_string = contents.split(',')
-        decoded = base64.b64decode(content_string)
-        suffix = os.path.splitext(filename)[1]
-        fh = tempfile.NamedTemporaryFile(suffix=suffix, delete=False)
-        fh.write(decoded)
-        fh.close()
-        # Validate if it's a readable Excel file
-        pd.ExcelFile(fh.name)
-        print(f"Successfully saved temp file: {fh.name}")
-        return fh.name
+        path = upload_path(upload['upload_id'])
+        if path is None:
+            raise ValueError("Upload not found, please upload the file again.")
+        # Validate if it's a readable Excel file (the sheets are parsed once, by compare_excels)
+        check_workbook(path)
+        print(f"Found uploaded file: {path}")
+        return path
     except Exception as e:
-        print(f"Error in save_temp_excel for file {filename}: {str(e)}")
+        print(f"Error in check_uploaded_excel for file {filename}: {str(e)}")
         raise
 
 @app.callback(
@@ -213,15 +138,22 @@ def save_temp_excel(contents, filename):
      Output('compare_feedback', 'children'),
      Output('download_compared', 'data')],
     [Input('do_compare', 'n_clicks')],
-    [State('upload1', 'contents'),
-     State('upload1', 'filename'),
-     State('upload2', 'contents'),
-     State('upload2', 'filename')],
+    [State('upload1', 'data'),
+     State('upload2', 'data')],
+    background=True,
+    running=[
+        (Output('do_compare', 'disabled'), True, False),
+        (Output('cancel_compare', 'disabled'), False, True),
+    ],
+    cancel=[Input('cancel_compare', 'n_clicks')],
+    progress=[Output('compare_progress', 'value'), Output('compare_progress', 'label')],
     prevent_initial_call=True
 )
-def handle_compare(n_clicks, file1_content, file1_name, file2_content, file2_name):
+def handle_compare(set_progress, n_clicks, upload1, upload2):
+    file1_name = upload1['filename'] if upload1 else None
+    file2_name = upload2['filename'] if upload2 else None
     try:
-        if not file1_content or not file2_content:
+        if not upload1 or not upload2:
             return (
                 "Please upload File 1.",
                 "Please upload File 2.",
@@ -237,30 +169,31 @@ def handle_compare(n_clicks, file1_content, file1_name, file2_content, file2_nam
                 None
             )
 
-        print("Saving temporary files...")
-        # Save uploads to temporary files
-        temp_file1 = save_temp_excel(file1_content, file1_name)
-        temp_file2 = save_temp_excel(file2_content, file2_name)
+        print("Checking uploaded files...")
+        set_progress((10, "Checking files..."))
+        temp_file1 = check_uploaded_excel(upload1)
+        temp_file2 = check_uploaded_excel(upload2)
         print(f"Temp File 1: {temp_file1}, Temp File 2: {temp_file2}")
+        # The result goes into a workspace of its own so concurrent users never share files
+        workspace = new_workspace()
 
         print("Starting comparison...")
-        # Perform comparison
-        result_file_path = compare_excels(temp_file1, temp_file2)
+        # Perform comparison once one of the worker slots is free
+        with job_slot(on_wait=lambda: set_progress((0, "Waiting for a free worker..."))):
+            set_progress((30, "Comparing..."))
+            result_file_path = compare_excels(temp_file1, temp_file2,
+                                              out_path=os.path.join(workspace, "Compared_Result.xlsx"))
         print(f"Comparison result saved at: {result_file_path}")
 
         # Read the result file for download
-        with open(result_file_path, "rb") as f:
-            data = f.read()
-        download_data = dict(content=data, filename="Compared_Result.xlsx")
+        download_data = dcc.send_file(result_file_path, filename="Compared_Result.xlsx")
         feedback = "Comparison complete. Download the result using the link below!"
+        set_progress((100, "Done"))
         print("Comparison successful, preparing download...")
 
-        # Clean up temporary files after download preparation
-        try:
-            os.unlink(temp_file2)  # Remove temp_file2
-            print(f"Deleted temp file 2: {temp_file2}")
-        except Exception as e:
-            print(f"Warning: Could not delete temp file {temp_file2}: {e}")
+        # Clean up the job workspace after download preparation (leftovers are removed by TTL)
+        remove_workspace(workspace)
+        print(f"Deleted workspace: {workspace}")
 
         return (
             f"Uploaded: {file1_name}",
@@ -0,0 +1,167 @@
+import csv
+import hashlib
+import io
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from dt_export import EXPORT_EXTENSIONS, export_path
+from dt_workspace import atomic_write
+
+try:
+    import yaml
+except ImportError:
+    yaml = None
+
+
+def _flag(value):
+    # CSV cells are text, so 'false' and '0' have to be read as False
+    return value if isinstance(value, bool) else str(value).strip().lower() in ('1', 'true', 'yes', 'y')
+
+
+# Options a manifest entry may set, with the type its text is converted to (lists are ';'-separated in CSV)
+OPTION_TYPES = {'key': str, 'chunksize': int, 'styling': str, 'pass_through': list, 'workers': int, 'header2': int,
+                'sheets': list, 'sheet_workers': int, 'variance_threshold': float, 'diff_export': str,
+                'diffs_only': _flag}
+SUMMARY_FILE = 'summary.csv'
+SUMMARY_FIELDS = ['pair_id', 'status', 'file1', 'file2', 'report', 'diff_export', 'matched', 'left_only', 'right_only',
+                  'diff_rows', 'diff_cells', 'seconds', 'error']
+
+
+def _normalize_pair(entry, base, number):
+    if not entry.get('file1') or not entry.get('file2'):
+        raise ValueError(f"Manifest entry {number} needs both file1 and file2.")
+    unknown = set(entry) - {'file1', 'file2', 'report'} - set(OPTION_TYPES)
+    if unknown:
+        raise ValueError(f"Manifest entry {number} has unknown field(s): {', '.join(sorted(unknown))}.")
+
+    options = {}
+    for name, kind in OPTION_TYPES.items():
+        value = entry.get(name)
+        if value is None:
+            continue
+        if kind is list and isinstance(value, str):
+            value = [v.strip() for v in value.split(';') if v.strip()]
+        options[name] = kind(value)
+    return {
+        'file1': os.path.join(base, str(entry['file1'])),
+        'file2': os.path.join(base, str(entry['file2'])),
+        'report': entry.get('report'),
+        'options': options,
+    }
+
+
+def read_manifest(path):
+    """Read the pairs to compare from a CSV or YAML manifest.
+
+    A CSV has a header with file1, file2 and optionally report plus any of
+    OPTION_TYPES as columns; empty cells keep the default. A YAML manifest
+    is a list of such mappings, or {'defaults': {...}, 'pairs': [...]}.
+    Relative paths are taken relative to the manifest.
+    """
+    base = os.path.dirname(os.path.abspath(path))
+    if path.lower().endswith(('.yaml', '.yml')):
+        if yaml is None:
+            raise ImportError("Reading a YAML manifest needs PyYAML (pip install pyyaml).")
+        with open(path, encoding='utf-8') as f:
+            doc = yaml.safe_load(f) or []
+        defaults = doc.get('defaults') or {} if isinstance(doc, dict) else {}
+        entries = [{**defaults, **entry} for entry in (doc.get('pairs') or [] if isinstance(doc, dict) else doc)]
+    else:
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            entries = [{k.strip(): v.strip() for k, v in row.items() if k and v and v.strip()}
+                       for row in csv.DictReader(f)]
+    return [_normalize_pair(entry, base, number) for number, entry in enumerate(entries, start=1)]
+
+
+def pair_id(pair):
+    """Stable name for a pair: the two file stems plus a hash of the paths and options."""
+    # Worker counts and timing output do not change the result, so they do not change the id either
+    options = {k: v for k, v in pair['options'].items() if k not in ('workers', 'sheet_workers', 'timings')}
+    raw = json.dumps([os.path.abspath(pair['file1']), os.path.abspath(pair['file2']), options], sort_keys=True)
+    stem1 = os.path.splitext(os.path.basename(pair['file1']))[0]
+    stem2 = os.path.splitext(os.path.basename(pair['file2']))[0]
+    return f"{stem1}_vs_{stem2}_{hashlib.sha1(raw.encode()).hexdigest()[:8]}".replace(' ', '_')
+
+
+def load_summary(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, newline='', encoding='utf-8') as f:
+        return {row['pair_id']: row for row in csv.DictReader(f)}
+
+
+def write_summary(path, rows):
+    buf = io.StringIO()
+    writer = csv.DictWriter(buf, fieldnames=SUMMARY_FIELDS, extrasaction='ignore')
+    writer.writeheader()
+    writer.writerows(rows.values())
+    atomic_write(path, buf.getvalue().encode('utf-8'))
+
+
+def _run_pair(compare, pid, file1, file2, report, options):
+    row = {'pair_id': pid, 'file1': file1, 'file2': file2, 'report': report}
+    start = time.perf_counter()
+    try:
+        row.update(compare(file1, file2, out_path=report, **options))
+        row['status'] = 'ok'
+    except Exception as e:
+        row['status'] = 'error'
+        row['error'] = f"{type(e).__name__}: {e}"
+    row['seconds'] = round(time.perf_counter() - start, 2)
+    return row
+
+
+def run_batch(pairs, compare, out_dir, workers=None, resume=True):
+    """Run compare(file1, file2, out_path=..., **options) for every pair in a process pool.
+
+    Each pair writes its own report into out_dir (CSV when the pair streams
+    with chunksize, xlsx otherwise) and out_dir/summary.csv is rewritten after
+    every finished pair, so an interrupted batch picks up where it stopped:
+    with resume=True pairs already marked ok whose report (or diff export,
+    for diffs_only) exists are skipped.
+    compare must return a dict of counts (see dt_compare.summarize) and be
+    importable by the worker processes. Returns the summary rows by pair id.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    summary_path = os.path.join(out_dir, SUMMARY_FILE)
+    summary = load_summary(summary_path) if resume else {}
+
+    todo = []
+    for pair in pairs:
+        pid = pair_id(pair)
+        ext = '.csv' if pair['options'].get('chunksize') else '.xlsx'
+        report = os.path.join(out_dir, pair['report'] or pid + ext)
+        options = pair['options']
+        if options.get('diff_export') and options['diff_export'] not in EXPORT_EXTENSIONS:
+            # A diff export file name is taken relative to out_dir, like the report
+            options = {**options, 'diff_export': os.path.join(out_dir, options['diff_export'])}
+        # A diffs-only pair leaves just its diff export behind
+        output = export_path(report, options.get('diff_export')) if options.get('diffs_only') else report
+        done = summary.get(pid)
+        if done and done['status'] == 'ok' and os.path.exists(output):
+            print(f"⏭️ {pid}: already done")
+            continue
+        todo.append((pid, {**pair, 'options': options}, report))
+
+    print(f"Comparing {len(todo)} of {len(pairs)} pair(s)...")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            pool.submit(_run_pair, compare, pid, pair['file1'], pair['file2'], report, pair['options']): (pid, pair, report)
+            for pid, pair, report in todo
+        }
+        for future in as_completed(futures):
+            pid, pair, report = futures[future]
+            try:
+                row = future.result()
+            except Exception as e:
+                # The worker process itself died (e.g. out of memory)
+                row = {'pair_id': pid, 'file1': pair['file1'], 'file2': pair['file2'], 'report': report,
+                       'status': 'error', 'error': f"{type(e).__name__}: {e}"}
+            summary[pid] = row
+            write_summary(summary_path, summary)
+            mark = '✅' if row['status'] == 'ok' else '❌'
+            print(f"{mark} {pid}: {row['status']} {row.get('error') or ''}".rstrip())
+
+    return summary
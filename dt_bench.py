@@ -0,0 +1,288 @@
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+
+import numpy as np
+import pandas as pd
+
+from dt_compare import compare_columns, diff_records, render_result
+
+FULPROOF = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Ful proof code for DT Comparison.py')
+
+# Named shapes for the pipeline benchmark, options left out take the make_workbooks defaults
+SCENARIOS = {
+    'sample': dict(rows=1_000),
+    'typical': dict(rows=50_000),
+    'wide': dict(rows=20_000, columns=150),
+    'messy': dict(rows=50_000, mismatch_rate=0.05, missing_rate=0.02, extra_rate=0.02, date_format='iso'),
+    'large': dict(rows=500_000),
+}
+# How the Mail Plan writes its date cells; the Data Tab always has 20250630 / 2012025 numbers like the real export
+DATE_FORMATS = {
+    'text': lambda d: d.strftime('%m/%d/%Y'),
+    'iso': lambda d: d.strftime('%Y-%m-%d'),
+    'datetime': lambda d: d,
+}
+# Mail Plan columns that get the injected differences (the dates are overwritten by standardize_dates anyway)
+MISMATCH_COLUMNS = ['IA_CODE1_DESC_NEW', 'PRIMARY_SOURCE_CODE', 'PRIMARY_SPID1_NEW', 'POID', 'CAMPAIGN_CODE',
+                    'TEMPLATE_CODE', 'FINAL_LETTERSHOP_QTY']
+
+
+def make_pair(n_rows, n_cols=10, mismatch_rate=0.01, blank_rate=0.05, seed=0):
+    """Build two aligned frames of string codes with a known share of differences."""
+    rng = np.random.default_rng(seed)
+    df1 = pd.DataFrame({
+        f'COL_{c}': rng.integers(0, 1000, n_rows).astype(str).astype(object)
+        for c in range(n_cols)
+    })
+    df2 = df1.copy()
+    for col in df1.columns:
+        blanks = rng.random(n_rows) < blank_rate
+        df1.loc[blanks, col] = None
+        df2.loc[blanks, col] = None
+        changed = rng.random(n_rows) < mismatch_rate
+        df2.loc[changed, col] = 'X' + df2.loc[changed, col].astype(str)
+    return df1, df2
+
+
+def loop_compare(df1, df2):
+    """The original per-cell df.at loop from compare_excels, kept as the baseline."""
+    result_df = df1.copy()
+    comparison_matrix = []
+    for i in range(len(df1)):
+        row_status = []
+        for col in result_df.columns:
+            if col in df2.columns:
+                v1 = str(df1.at[i, col]) if pd.notna(df1.at[i, col]) else 'BLANK'
+                v2 = str(df2.at[i, col]) if pd.notna(df2.at[i, col]) else 'BLANK'
+
+                if v1 == 'BLANK' and v2 == 'BLANK':
+                    row_status.append('BLANK')
+                    result_df.at[i, col] = 'BLANK'
+                elif v1 == v2:
+                    row_status.append('MATCH')
+                else:
+                    row_status.append('DIFF')
+                    result_df.at[i, col] = f'DIFF: {v1} | {v2}'
+            else:
+                row_status.append('')
+        comparison_matrix.append(row_status)
+    return result_df, comparison_matrix
+
+
+def vector_compare(df1, df2):
+    status = compare_columns(df1, df2, df1.columns)
+    return render_result(df1, status, diff_records(df1, df2, status)), status
+
+
+def make_workbooks(out_dir, rows, columns=45, mismatch_rate=0.01, missing_rate=0.005, extra_rate=0.005,
+                   date_format='text', header_offset=18, seed=0):
+    """Write a synthetic Data Tab / Mail Plan pair shaped like the real ones and return their paths.
+
+    The Mail Plan has `columns` columns (the mapped ones plus fillers), its
+    header on row header_offset, its rows shuffled, mismatch_rate of its
+    mapped cells changed, missing_rate of the Data Tab CELL_IDs left out and
+    extra_rate rows of CELL_IDs the Data Tab does not have. Files are named
+    after their parameters, so a pair generated before is reused.
+    """
+    params = dict(rows=rows, columns=columns, mismatch_rate=mismatch_rate, missing_rate=missing_rate,
+                  extra_rate=extra_rate, date_format=date_format, header_offset=header_offset, seed=seed)
+    tag = hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()[:10]
+    path1 = os.path.join(out_dir, f'data_tab_{rows}_{tag}.xlsx')
+    path2 = os.path.join(out_dir, f'mail_plan_{rows}_{tag}.xlsx')
+    if os.path.exists(path1) and os.path.exists(path2):
+        return path1, path2
+    os.makedirs(out_dir, exist_ok=True)
+
+    rng = np.random.default_rng(seed)
+    n_extra = int(rows * extra_rate)
+    cell_ids = np.array([f'L{i:07d}' for i in range(rows + n_extra)], dtype=object)
+    codes = lambda prefix, n: np.char.add(prefix, rng.integers(0, 500, n).astype(str)).astype(object)
+    plan = pd.DataFrame({
+        'CELL_ID': cell_ids,
+        'IA_CODE1_DESC_NEW': rng.choice(['2X', '3X', '5X', 'ZZ'], rows + n_extra).astype(object),
+        'PRIMARY_SOURCE_CODE': codes('NOPAPERAPP', rows + n_extra),
+        'PRIMARY_SPID1_NEW': np.where(rng.random(rows + n_extra) < 0.5, None, codes('SP', rows + n_extra)),
+        'POID': codes('K9EM:', rows + n_extra),
+        'CAMPAIGN_CODE': codes('C', rows + n_extra),
+        'TEMPLATE_CODE': np.where(rng.random(rows + n_extra) < 0.3, None, codes('T', rows + n_extra)),
+        'EXPIRATION_DATE': DATE_FORMATS[date_format](datetime.datetime(2025, 6, 30)),
+        'PRESCREEN_DATE': DATE_FORMATS[date_format](datetime.datetime(2025, 2, 1)),
+        'FINAL_LETTERSHOP_QTY': rng.integers(1_000, 2_000_000, rows + n_extra),
+    })
+
+    # The Data Tab is the plan before the changes, minus the extra rows
+    tab = pd.DataFrame({
+        'CELL_ID': plan['CELL_ID'],
+        'IA_CODE_1': plan['IA_CODE1_DESC_NEW'],
+        'PRIMARY_SOURCE_CODE': plan['PRIMARY_SOURCE_CODE'],
+        'PRIMARY_SPID': plan['PRIMARY_SPID1_NEW'],
+        'POID': plan['POID'],
+        'CAMPAIGN_CODE': plan['CAMPAIGN_CODE'],
+        'TEMPLATE_CODE': plan['TEMPLATE_CODE'],
+        'EXPIRATION_DATE': 20250630,
+        'PRESCREEN_DATE': 2012025,
+        'QUANTITY': plan['FINAL_LETTERSHOP_QTY'],
+    }).iloc[:rows]
+
+    for col in MISMATCH_COLUMNS:
+        changed = rng.random(len(plan)) < mismatch_rate
+        if col == 'FINAL_LETTERSHOP_QTY':
+            plan.loc[changed, col] += rng.integers(1, 100, changed.sum())
+        else:
+            plan[col] = plan[col].astype(object)
+            plan.loc[changed, col] = 'X' + plan.loc[changed, col].astype(str)
+    for i in range(columns - len(plan.columns)):
+        plan[f'FILLER_{i}'] = codes('F', len(plan))
+
+    missing = rng.random(len(plan)) < missing_rate
+    missing[rows:] = False
+    plan = plan[~missing].sample(frac=1, random_state=seed)
+
+    tab.to_excel(path1, index=False)
+    # Rows above the header stay empty, like the title block of a real Mail Plan
+    plan.to_excel(path2, index=False, startrow=header_offset)
+    return path1, path2
+
+
+def _timed_run(path1, path2, cache_dir, options):
+    # Runs in a fresh process: cold imports, no parse or date memo left over, and its own peak RSS
+    os.environ['DT_COMPARE_CACHE_DIR'] = cache_dir
+    # The stage records end up in the history file, they need not be logged to stderr as well
+    os.environ.setdefault('DT_COMPARE_STAGE_LOG', 'off')
+    import runpy
+    compare_excels = runpy.run_path(FULPROOF, run_name='dt_fulproof')['compare_excels']
+    out_path = os.path.join(cache_dir, 'report.csv' if options.get('chunksize') else 'report.xlsx')
+    start = time.perf_counter()
+    counts = compare_excels(path1, path2, out_path=out_path, **options)
+    counts['seconds'] = round(time.perf_counter() - start, 4)
+    return counts
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(FULPROOF), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def _setup(name, params, options):
+    # Only runs of the same workbooks with the same options are compared with each other
+    return json.dumps([name, params, options], sort_keys=True)
+
+
+def run_pipeline(scenarios, work_dir='bench_data', history='bench_history.jsonl', repeat=3, options=None):
+    """Time compare_excels end to end on synthetic workbooks and append the results to history.
+
+    scenarios maps a name to make_workbooks arguments. Every repeat runs in
+    a new process with an empty cache; the history file gets one JSON line
+    per scenario with the median time and the stage records of that run
+    (see dt_timing), so runs can be compared across commits. The printed
+    table shows the previous time of the same setup next to the new one.
+    """
+    options = options or {}
+    commit = _git_commit()
+    last = {}
+    if os.path.exists(history):
+        with open(history, encoding='utf-8') as f:
+            for line in f:
+                entry = json.loads(line)
+                last[_setup(entry['scenario'], entry['params'], entry['options'])] = entry
+
+    print(f"{'scenario':<12} {'rows':>9} {'median (s)':>11} {'previous (s)':>13}  counts")
+    for name, params in scenarios.items():
+        path1, path2 = make_workbooks(work_dir, **params)
+        runs = []
+        for i in range(repeat):
+            cache_dir = os.path.join(work_dir, 'cache', f'{os.getpid()}_{name}_{i}')
+            with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn')) as pool:
+                runs.append(pool.submit(_timed_run, path1, path2, cache_dir, options).result())
+            shutil.rmtree(cache_dir, ignore_errors=True)
+        median = statistics.median(r['seconds'] for r in runs)
+        result = min(runs, key=lambda r: abs(r['seconds'] - median))
+
+        entry = {
+            'scenario': name,
+            'time': datetime.datetime.now().isoformat(timespec='seconds'),
+            'commit': commit,
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'params': params,
+            'options': options,
+            'repeat': repeat,
+            'seconds': median,
+            'counts': {k: v for k, v in result.items() if k not in ('stages', 'seconds')},
+            'stages': result['stages'],
+        }
+        with open(history, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, default=str) + '\n')
+
+        before = last.get(_setup(name, params, options), {}).get('seconds')
+        before = f'{before:>13.3f}' if before is not None else f"{'-':>13}"
+        counts = ', '.join(f'{k}={v}' for k, v in entry['counts'].items())
+        print(f"{name:<12} {params.get('rows', ''):>9} {median:>11.3f} {before}  {counts}")
+
+
+def run(sizes, loop_rows):
+    print(f"{'rows':>10} {'loop (s)':>12} {'vectorized (s)':>15} {'speed-up':>10}")
+    for n in sizes:
+        df1, df2 = make_pair(n)
+
+        start = time.perf_counter()
+        vec_result, _ = vector_compare(df1, df2)
+        vec_time = time.perf_counter() - start
+
+        # The loop is linear in rows, so large sizes are timed on a slice and scaled up
+        sample = min(n, loop_rows)
+        start = time.perf_counter()
+        loop_result, _ = loop_compare(df1.iloc[:sample], df2.iloc[:sample])
+        loop_time = (time.perf_counter() - start) * n / sample
+        assert loop_result.equals(vec_result.iloc[:sample]), "vectorized result differs from the loop"
+
+        note = '' if sample == n else ' (est.)'
+        print(f"{n:>10} {loop_time:>12.2f} {vec_time:>15.3f} {loop_time / vec_time:>9.0f}x{note}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the cell comparison loop against the vectorized kernel, "
+                                                 "or with --scenarios the whole compare_excels pipeline.")
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--loop-rows', type=int, default=100_000,
+                        help="time the loop on at most this many rows and extrapolate beyond it")
+    parser.add_argument('--scenarios', nargs='+', choices=sorted(SCENARIOS),
+                        help="run the pipeline benchmark on these synthetic workbook shapes")
+    parser.add_argument('--rows', type=int, help="override the row count of every scenario")
+    parser.add_argument('--columns', type=int, help="Mail Plan column count")
+    parser.add_argument('--mismatch-rate', type=float)
+    parser.add_argument('--missing-rate', type=float, help="share of Data Tab CELL_IDs missing from the Mail Plan")
+    parser.add_argument('--extra-rate', type=float, help="share of extra Mail Plan CELL_IDs")
+    parser.add_argument('--date-format', choices=sorted(DATE_FORMATS))
+    parser.add_argument('--header-offset', type=int, help="row of the Mail Plan header (compare_excels detects it)")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--work-dir', default='bench_data', help="generated workbooks and per-run caches")
+    parser.add_argument('--history', default='bench_history.jsonl', help="results are appended here")
+    parser.add_argument('--chunksize', type=int, help="benchmark the streaming mode")
+    parser.add_argument('--styling', choices=['cells', 'conditional'])
+    parser.add_argument('--column-workers', type=int)
+    args = parser.parse_args()
+
+    if args.scenarios:
+        overrides = {name: getattr(args, name) for name in ('rows', 'columns', 'mismatch_rate', 'missing_rate',
+                                                             'extra_rate', 'date_format', 'header_offset')
+                     if getattr(args, name) is not None}
+        options = {name: value for name, value in (('chunksize', args.chunksize), ('styling', args.styling),
+                                                   ('workers', args.column_workers)) if value is not None}
+        run_pipeline({name: {**SCENARIOS[name], **overrides} for name in args.scenarios},
+                     args.work_dir, args.history, args.repeat, options)
+    else:
+        run(args.sizes, args.loop_rows)
@@ -0,0 +1,126 @@
+import hashlib
+import io
+import json
+import os
+import pickle
+import tempfile
+from functools import lru_cache
+
+import diskcache
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401  (pandas picks it up for to_parquet/read_parquet)
+    HAVE_ARROW = True
+except ImportError:
+    HAVE_ARROW = False
+
+# Parsed frames and comparison results, keyed by file content, evicted least-recently-used beyond CACHE_SIZE bytes
+CACHE_DIR = os.environ.get('DT_COMPARE_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'dt_compare_cache'))
+CACHE_SIZE = int(os.environ.get('DT_COMPARE_CACHE_SIZE', 2 * 1024 ** 3))
+# Part of every key: bump it when parsing or comparison logic changes so old entries are never reused
+CACHE_VERSION = 4
+
+cache = diskcache.Cache(CACHE_DIR, size_limit=CACHE_SIZE, eviction_policy='least-recently-used')
+
+
+@lru_cache(maxsize=256)
+def _digest(path, size, mtime_ns):
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def file_digest(path):
+    """sha256 of the file contents (memoised while the file's size and mtime stay the same)."""
+    st = os.stat(path)
+    return _digest(os.path.abspath(path), st.st_size, st.st_mtime_ns)
+
+
+def _key(kind, *parts):
+    raw = json.dumps([CACHE_VERSION, kind, parts], sort_keys=True, default=repr)
+    return f'{kind}-{hashlib.sha256(raw.encode()).hexdigest()}'
+
+
+def _dump_frame(df):
+    # Parquet when the frame fits Arrow's types; columns mixing numbers and text (common in these workbooks) fall back to pickle
+    if HAVE_ARROW:
+        buf = io.BytesIO()
+        try:
+            df.to_parquet(buf)
+            return 'parquet', buf.getvalue()
+        except (ValueError, TypeError, NotImplementedError):
+            pass
+    return 'pickle', pickle.dumps(df, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _load_frame(entry):
+    fmt, data = entry
+    if fmt == 'parquet':
+        return pd.read_parquet(io.BytesIO(data))
+    return pickle.loads(data)
+
+
+def read_cached(path, reader, **options):
+    """reader(path, **options), served from the cache when the same file was parsed with the same options before."""
+    key = _key('frame', file_digest(path), f'{reader.__module__}.{reader.__qualname__}', options)
+    entry = cache.get(key)
+    if entry is not None:
+        return _load_frame(entry)
+    df = reader(path, **options)
+    cache.set(key, _dump_frame(df))
+    return df
+
+
+def cached_call(path, func, **options):
+    """func(path, **options) for a small picklable result, served from the cache for a file it has seen before."""
+    key = _key('call', file_digest(path), f'{func.__module__}.{func.__qualname__}', options)
+    result = cache.get(key)
+    if result is None:
+        result = func(path, **options)
+        cache.set(key, result)
+    return result
+
+
+def cached_comparison(path1, path2, compute, **options):
+    """compute() for this pair of files and options, or its stored result if the pair was compared before."""
+    key = _key('result', file_digest(path1), file_digest(path2), options)
+    result = cache.get(key)
+    if result is None:
+        result = compute()
+        cache.set(key, result)
+    return result
+
+
+def incremental_comparison(path1, path2, compute, **options):
+    """Like cached_comparison, for a compute(previous) that returns (result, hashes) (see dt_compare.compare_incremental).
+
+    When this exact pair was not compared before, previous is the (result,
+    hashes) of the last comparison with the same options that shared one of
+    the two files, so a re-uploaded file with a few edited rows only has
+    those rows compared again. previous is None when there is no such run.
+    """
+    digest1, digest2 = file_digest(path1), file_digest(path2)
+    key = _key('result', digest1, digest2, options)
+    result = cache.get(key)
+    if result is not None:
+        return result
+
+    previous = None
+    for side, digest in (('left', digest1), ('right', digest2)):
+        latest = cache.get(_key('latest', side, digest, options))
+        if latest is not None:
+            previous = (cache.get(latest), cache.get(f'hashes-{latest}'))
+            if previous[0] is not None and previous[1] is not None:
+                break
+            previous = None
+
+    result, hashes = compute(previous)
+    cache.set(key, result)
+    # Row hashes are kept next to the result so a later run can tell which rows changed
+    cache.set(f'hashes-{key}', hashes)
+    cache.set(_key('latest', 'left', digest1, options), key)
+    cache.set(_key('latest', 'right', digest2, options), key)
+    return result
@@ -0,0 +1,467 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# Standard column name -> the names it goes by in the Data Tab / Mail Plan files
+COLUMN_MAPPING = {
+    'IA_Code': ['IA_Code_1', 'IA_CODE1_DESC_NEW'],
+    'Quantity': ['QUANTITY', 'FINAL_LETTERSHOP_QTY'],
+    'PRIMARY_SOURCE_CODE': ['PRIMARY_SOURCE_CODE'],
+    'PRIMARY_SPID': ['PRIMARY_SPID', 'PRIMARY_SPID1_NEW'],
+    'CAMPAIGN_CODE': ['CAMPAIGN_CODE'],
+    'TEMPLATE_CODE': ['TEMPLATE_CODE'],
+    'EXPIRATION_DATE': ['EXPIRATION_DATE'],
+    'PRESCREEN_DATE': ['PRESCREEN_DATE'],
+    'POID': ['POID'],
+    'CELL_ID': ['CELL_ID']
+}
+
+
+def apply_mapping(df, mapping=COLUMN_MAPPING):
+    """Rename columns to their standard names (case insensitive)."""
+    rename_map = {}
+    for std_col, variants in mapping.items():
+        for v in variants:
+            for col in df.columns:
+                if str(col).strip().upper() == v.strip().upper():
+                    rename_map[col] = std_col
+                    break
+    return df.rename(columns=rename_map)
+
+
+# Code columns hold few distinct values, so they are stored as categories in projection mode
+CATEGORY_COLUMNS = ('IA_Code', 'PRIMARY_SOURCE_CODE', 'PRIMARY_SPID', 'CAMPAIGN_CODE', 'TEMPLATE_CODE', 'POID')
+
+
+def convert_types(df):
+    """Give mapped columns compact dtypes: codes become categories, Quantity a nullable Int64.
+
+    Quantity is only converted when every value is a whole number, so
+    anything odd in it still shows up in the comparison as it was read.
+    """
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    if 'Quantity' in df.columns:
+        qty = pd.to_numeric(df['Quantity'], errors='coerce')
+        if qty.notna().sum() == df['Quantity'].notna().sum() and (qty.dropna() % 1 == 0).all():
+            df['Quantity'] = qty.astype('Int64')
+    return df
+
+
+def normalize_key(series):
+    """Turn a key column into stripped strings so both files join on the same values."""
+    # 555.0 (read as float because of blanks) and 555 should be the same cell
+    if pd.api.types.is_float_dtype(series) and (series.dropna() % 1 == 0).all():
+        series = series.astype('Int64')
+    return series.astype(str).str.strip().where(series.notna(), '')
+
+
+def align_on_key(df1, df2, key='CELL_ID', verbose=True):
+    """Pair the rows of df1 and df2 on key (a column name or a list of them).
+
+    Returns (left, right, left_only, right_only): left and right hold the
+    matched rows in the same order, sorted by key, the other two hold rows
+    found in only one file. Duplicate keys are paired by occurrence (first
+    with first, second with second) so the join never builds a cross product.
+    Rows with a blank key (every key column missing, like a totals row) are
+    never paired: they are listed first among the rows of their own file only.
+    """
+    keys = [key] if isinstance(key, str) else list(key)
+    missing = [k for k in keys if k not in df1.columns or k not in df2.columns]
+
+    if missing:
+        print(f"⚠️ Key column(s) {missing} not found in both files, aligning by row position.")
+        keys = ['_row']
+        k1 = pd.DataFrame({'_row': np.arange(len(df1))})
+        k2 = pd.DataFrame({'_row': np.arange(len(df2))})
+    else:
+        k1 = pd.DataFrame({k: normalize_key(df1[k]) for k in keys})
+        k2 = pd.DataFrame({k: normalize_key(df2[k]) for k in keys})
+
+    for frame in (k1, k2):
+        frame['_dup'] = frame.groupby(keys, sort=False).cumcount()
+        frame['_pos'] = np.arange(len(frame))
+    # '' is where a missing key ends up after normalize_key; two of them are not the same cell
+    blank1 = (k1[keys] == '').all(axis=1).to_numpy()
+    blank2 = (k2[keys] == '').all(axis=1).to_numpy()
+    k1, k2 = k1[~blank1], k2[~blank2]
+
+    # Hash join on the key columns only, the data columns are gathered afterwards by position
+    merged = k1.merge(k2, on=keys + ['_dup'], how='outer', sort=True,
+                      suffixes=('_1', '_2'), indicator=True)
+    both = merged[merged['_merge'] == 'both']
+
+    left = df1.iloc[both['_pos_1'].astype(np.int64)].reset_index(drop=True)
+    right = df2.iloc[both['_pos_2'].astype(np.int64)].reset_index(drop=True)
+    if not missing:
+        for k in keys:
+            left[k] = both[k].to_numpy()
+            right[k] = both[k].to_numpy()
+
+    # Blank keys sort first, as they would have in the merge
+    left_only = df1.iloc[np.concatenate([np.flatnonzero(blank1),
+                                         merged.loc[merged['_merge'] == 'left_only', '_pos_1'].astype(np.int64)])]
+    right_only = df2.iloc[np.concatenate([np.flatnonzero(blank2),
+                                          merged.loc[merged['_merge'] == 'right_only', '_pos_2'].astype(np.int64)])]
+
+    if verbose:
+        print(f"Matched rows: {len(left)}, only in file 1: {len(left_only)}, only in file 2: {len(right_only)}")
+    return left, right, left_only.reset_index(drop=True), right_only.reset_index(drop=True)
+
+
+# Cell status codes used by the comparison matrix
+NOT_COMPARED, MATCH, DIFF, BLANK = 0, 1, 2, 3
+STATUS_LABELS = np.array(['', 'MATCH', 'DIFF', 'BLANK'])
+
+
+def as_text(series):
+    """String form of a column the way the report shows it, missing values become 'BLANK'."""
+    return series.astype(str).where(series.notna(), 'BLANK')
+
+
+def compare_columns(df1, df2, columns, strip=False):
+    """Compare aligned frames column by column and return a uint8 status frame.
+
+    Each cell is BLANK when both sides are missing, MATCH when the string
+    forms are equal and DIFF otherwise (a value against a missing one is a DIFF).
+    strip=True ignores leading/trailing whitespace.
+    """
+    status = {}
+    for col in columns:
+        a, b = df1[col], df2[col]
+        na1 = a.isna().to_numpy()
+        na2 = b.isna().to_numpy()
+        s1, s2 = a.astype(str), b.astype(str)
+        if strip:
+            s1, s2 = s1.str.strip(), s2.str.strip()
+        same = s1.to_numpy() == s2.to_numpy()
+        codes = np.full(len(a), DIFF, dtype=np.uint8)
+        codes[same & ~na1 & ~na2] = MATCH
+        codes[na1 & na2] = BLANK
+        status[col] = codes
+    return pd.DataFrame(status, index=df1.index, columns=list(columns))
+
+
+def diff_records(df1, df2, status):
+    """The DIFF cells of status as sparse records, one row each.
+
+    Columns: row (position in the aligned frames), column, and left/right,
+    the two values as text the way the report shows them.
+    """
+    parts = []
+    for col in status.columns:
+        rows = np.flatnonzero(status[col].to_numpy() == DIFF)
+        if len(rows):
+            parts.append(pd.DataFrame({
+                'row': rows,
+                'column': col,
+                'left': as_text(df1[col].iloc[rows]).to_numpy(),
+                'right': as_text(df2[col].iloc[rows]).to_numpy(),
+            }))
+    return _concat_diffs(parts)
+
+
+def _concat_diffs(parts):
+    if not parts:
+        return pd.DataFrame({'row': np.array([], dtype=np.int64), 'column': pd.Categorical([]),
+                             'left': np.array([], dtype=object), 'right': np.array([], dtype=object)})
+    diffs = pd.concat(parts, ignore_index=True)
+    diffs['column'] = diffs['column'].astype('category')
+    return diffs
+
+
+def mismatch_mask(status):
+    """Boolean array, True for every row with at least one DIFF."""
+    return (status.to_numpy() == DIFF).any(axis=1)
+
+
+def take_rows(result_df, status, diffs, positions):
+    """Keep only the rows at positions (sorted) of a comparison, renumbering diffs to match."""
+    positions = np.asarray(positions, dtype=np.int64)
+    rows = diffs['row'].to_numpy()
+    idx = np.searchsorted(positions, rows)
+    keep = idx < len(positions)
+    keep[keep] = positions[idx[keep]] == rows[keep]
+    picked = diffs[keep].assign(row=idx[keep]).reset_index(drop=True)
+    return (result_df.iloc[positions].reset_index(drop=True),
+            status.iloc[positions].reset_index(drop=True), picked)
+
+
+def render_result(result_df, status, diffs):
+    """Return result_df with the BLANK and 'DIFF: v1 | v2' markers of status and diffs filled in.
+
+    This is the only place the marker strings are built, so exports call it
+    on just the rows they are about to write. result_df is not modified.
+    """
+    out_df = result_df.copy(deep=False)
+    by_column = {col: group for col, group in diffs.groupby('column', observed=True, sort=False)}
+    for col in status.columns:
+        blank = status[col].to_numpy() == BLANK
+        col_diffs = by_column.get(col)
+        if col_diffs is None and not blank.any():
+            continue
+        out = out_df[col].to_numpy(dtype=object, copy=True)
+        out[blank] = 'BLANK'
+        if col_diffs is not None:
+            out[col_diffs['row'].to_numpy()] = ('DIFF: ' + col_diffs['left'] + ' | ' + col_diffs['right']).to_numpy()
+        out_df[col] = out
+    return out_df
+
+
+# Frames a forked worker inherits from compare_frames(workers=n), so only column names travel to it
+_shared_frames = None
+
+
+def _share_frames(df1, df2):
+    global _shared_frames
+    _shared_frames = (df1, df2)
+
+
+def _compare_block(columns, strip, block1=None, block2=None):
+    # Worker side of compare_frames(workers=n): status codes plus the diff records, never whole columns
+    if block1 is None:
+        df1, df2 = _shared_frames
+        block1, block2 = df1[columns], df2[columns]
+    status = compare_columns(block1, block2, columns, strip=strip)
+    return status, diff_records(block1, block2, status)
+
+
+def _compare_parallel(df1, df2, columns, strip, workers, threads):
+    blocks = [list(b) for b in np.array_split(np.array(columns, dtype=object), min(workers, len(columns)))]
+    if threads:
+        pool = ThreadPoolExecutor(max_workers=len(blocks))
+        tasks = [(b, strip, df1[b], df2[b]) for b in blocks]
+    elif 'fork' in multiprocessing.get_all_start_methods():
+        # Forked workers see df1/df2 without pickling them
+        pool = ProcessPoolExecutor(max_workers=len(blocks), mp_context=multiprocessing.get_context('fork'),
+                                   initializer=_share_frames, initargs=(df1, df2))
+        tasks = [(b, strip) for b in blocks]
+    else:
+        # spawn (Windows): each worker gets its own block, pickled once
+        pool = ProcessPoolExecutor(max_workers=len(blocks))
+        tasks = [(b, strip, df1[b], df2[b]) for b in blocks]
+
+    with pool:
+        parts = [f.result() for f in [pool.submit(_compare_block, *task) for task in tasks]]
+    status = pd.concat([part[0] for part in parts], axis=1)
+    status.index = df1.index
+    diffs = _concat_diffs([part[1] for part in parts if len(part[1])])
+    return status[list(columns)], diffs
+
+
+def compare_frames(df1, df2, columns=None, strip=False, workers=None, threads=False):
+    """Compare key-aligned df1 and df2 into (result_df, status, diffs).
+
+    result_df holds the df1 values (plus Quantity_Diff), status the uint8
+    code of every compared cell and diffs the sparse DIFF records (see
+    diff_records); render_result turns them into the marked-up report rows.
+    columns limits the comparison to those columns, by default every column of df1 also in df2.
+    workers > 1 splits the compared columns into that many blocks and compares
+    them in a process pool (a thread pool with threads=True, which only helps
+    where pandas releases the GIL); only each block's columns are sent to a
+    worker (none at all where workers are forked) and only the status codes
+    and diff records come back.
+    """
+    result_df = df1.copy()
+
+    if 'Quantity' in df1.columns and 'Quantity' in df2.columns:
+        diff_series = pd.to_numeric(df1['Quantity'], errors='coerce') - pd.to_numeric(df2['Quantity'], errors='coerce')
+        result_df.insert(result_df.columns.get_loc('Quantity') + 1, 'Quantity_Diff', diff_series)
+
+    # One vectorized pass per column, uncompared columns (e.g. Quantity_Diff) stay NOT_COMPARED
+    compared_cols = [col for col in result_df.columns if col in df2.columns and (columns is None or col in columns)]
+    if workers and workers > 1 and len(compared_cols) > 1:
+        status, diffs = _compare_parallel(df1, df2, compared_cols, strip, workers, threads)
+        return result_df, status, diffs
+
+    status = compare_columns(df1, df2, compared_cols, strip=strip)
+    return result_df, status, diff_records(df1, df2, status)
+
+
+def _row_keys(df, keys, normalized=False):
+    # The normalized key of every row as an index (a MultiIndex for compound keys);
+    # aligned frames already hold normalized keys, normalized=True skips the string work for them
+    columns = [df[k] if normalized else normalize_key(df[k]) for k in keys]
+    return pd.Index(columns[0]) if len(keys) == 1 else pd.MultiIndex.from_arrays(columns)
+
+
+def row_hashes(df, key='CELL_ID', index=None):
+    """One uint64 hash of every row of df, indexed by its normalized key (or by index when given)."""
+    keys = [key] if isinstance(key, str) else list(key)
+    index = _row_keys(df, keys) if index is None else index
+    return pd.Series(pd.util.hash_pandas_object(df, index=False).to_numpy(), index=index)
+
+
+def _changed_keys(old, new):
+    # Keys added, removed or with a different row hash
+    common = new.index.intersection(old.index)
+    edited = common[new[common].to_numpy() != old[common].to_numpy()]
+    return new.index.symmetric_difference(old.index).append(edited)
+
+
+def _sort_by_key(parts, keys, normalized=False):
+    # Concatenate row blocks and put them in align_on_key's order (sorted by normalized key)
+    parts = [p for p in parts if len(p)] or parts[:1]
+    df = pd.concat(parts, ignore_index=True)
+    sort_keys = pd.DataFrame({k: df[k] if normalized else normalize_key(df[k]) for k in keys})
+    order = sort_keys.sort_values(keys, kind='stable').index.to_numpy()
+    return df.iloc[order].reset_index(drop=True), order
+
+
+def _patch(previous, df1, df2, index1, index2, keys, changed, verbose, compare_options):
+    result_df, status, diffs, left_only, right_only = previous
+    # The rows of the previous result that did not change, in their old order
+    kept = np.flatnonzero(~_row_keys(result_df, keys, normalized=True).isin(changed))
+    kept_result, kept_status, kept_diffs = take_rows(result_df, status, diffs, kept)
+
+    sub1 = df1[index1.isin(changed)]
+    sub2 = df2[index2.isin(changed)]
+    new1, new2, new_left, new_right = align_on_key(sub1, sub2, keys, verbose=False)
+    new_result, new_status, new_diffs = compare_frames(new1, new2, **compare_options)
+
+    merged, order = _sort_by_key([kept_result, new_result], keys, normalized=True)
+    status = pd.concat([kept_status, new_status], ignore_index=True).iloc[order].reset_index(drop=True)
+    # Renumber the diff rows: new rows come after the kept ones, then the whole block is re-sorted
+    position = np.empty(len(order), dtype=np.int64)
+    position[order] = np.arange(len(order))
+    diffs = pd.concat([kept_diffs.astype({'column': object}),
+                       new_diffs.astype({'column': object}).assign(row=new_diffs['row'] + len(kept))],
+                      ignore_index=True)
+    diffs['row'] = position[diffs['row'].to_numpy()]
+    column_order = pd.Index(status.columns).get_indexer(diffs['column'])
+    diffs = _concat_diffs([diffs.iloc[np.lexsort((diffs['row'].to_numpy(), column_order))]])
+
+    # Categories of the two blocks differ, so concat falls back to object; restore the dtype
+    for col in result_df.columns:
+        if isinstance(result_df[col].dtype, pd.CategoricalDtype):
+            merged[col] = merged[col].astype('category')
+
+    left_only, _ = _sort_by_key([left_only[~_row_keys(left_only, keys).isin(changed)], new_left], keys)
+    right_only, _ = _sort_by_key([right_only[~_row_keys(right_only, keys).isin(changed)], new_right], keys)
+    if verbose:
+        print(f"Re-compared {len(changed)} changed key(s), kept {len(kept)} rows of the previous comparison.")
+        print(f"Matched rows: {len(merged)}, only in file 1: {len(left_only)}, only in file 2: {len(right_only)}")
+    return merged, status, diffs, left_only, right_only
+
+
+def compare_incremental(df1, df2, key='CELL_ID', previous=None, max_changed=0.2, verbose=True, **compare_options):
+    """align_on_key and compare_frames, re-comparing only the rows that changed since previous.
+
+    Returns (result, hashes): result is (result_df, status, diffs, left_only,
+    right_only) as from a full comparison and hashes holds the row_hashes of
+    both frames. previous is such a (result, hashes) pair from an earlier run
+    with the same options. Rows whose key was added, removed or whose hash
+    changed on either side are compared again and patched into the previous
+    result; everything else is reused. A full comparison is done instead when
+    there is no previous run, keys are duplicated or missing, the columns
+    changed, or more than max_changed of the rows did.
+    """
+    keys = [key] if isinstance(key, str) else list(key)
+    has_keys = all(k in df1.columns and k in df2.columns for k in keys)
+    if has_keys:
+        index1, index2 = _row_keys(df1, keys), _row_keys(df2, keys)
+        hashes = (row_hashes(df1, keys, index1), row_hashes(df2, keys, index2))
+    else:
+        hashes = None
+
+    if previous is not None and hashes is not None and previous[1] is not None:
+        (result_df, status, diffs, left_only, right_only), (old1, old2) = previous
+        usable = (list(left_only.columns) == list(df1.columns) and list(right_only.columns) == list(df2.columns)
+                  and all(h.index.is_unique for h in hashes + (old1, old2)))
+        if usable:
+            changed = _changed_keys(old1, hashes[0]).union(_changed_keys(old2, hashes[1]))
+            if len(changed) <= max_changed * max(len(df1), len(df2), 1):
+                return _patch(previous[0], df1, df2, index1, index2, keys, changed, verbose, compare_options), hashes
+
+    left, right, left_only, right_only = align_on_key(df1, df2, key, verbose=verbose)
+    result_df, status, diffs = compare_frames(left, right, **compare_options)
+    return (result_df, status, diffs, left_only, right_only), hashes
+
+
+def summarize(status, left_only, right_only):
+    """Counts describing one comparison, as printed and written to batch summaries."""
+    diff = status.to_numpy() == DIFF
+    return {
+        'matched': len(status),
+        'left_only': len(left_only),
+        'right_only': len(right_only),
+        'diff_rows': int(diff.any(axis=1).sum()) if diff.size else 0,
+        'diff_cells': int(diff.sum()),
+    }
+
+
+# Parsed dates shared across columns and files, keyed by the stripped cell text
+_DATE_CACHE = {}
+_DATE_CACHE_LIMIT = 100_000
+DATE_FORMATS = ("%Y-%m-%d", "%m/%d/%Y", "%m-%d-%Y", "%Y%m%d")
+
+
+def _parse_seven_digit(texts):
+    # 7-digit MMDDYYYY like 2012025 -> 02-01-2025 (single digit month when the first two digits are > 12)
+    first_two = texts.str[:2].astype(int)
+    mm = texts.str[:1].where(first_two > 12, texts.str[:2]).astype(int)
+    dd = texts.str[1:3].where(mm < 10, texts.str[2:4]).astype(int)
+    yyyy = texts.str[-4:].astype(int)
+    return pd.to_datetime(pd.DataFrame({'year': yyyy, 'month': mm, 'day': dd}), errors='coerce')
+
+
+def _parse_dates(texts):
+    """Parse unique date strings, trying each known layout in turn on whatever is still unparsed."""
+    parsed = pd.Series(pd.NaT, index=texts.index, dtype='datetime64[ns]')
+    digits = texts.str.isdigit()
+
+    seven = digits & (texts.str.len() == 7)
+    if seven.any():
+        parsed[seven] = _parse_seven_digit(texts[seven])
+
+    eight = digits & (texts.str.len() == 8)
+    if eight.any():
+        parsed[eight] = pd.to_datetime(texts[eight], format="%m%d%Y", errors='coerce')
+
+    for fmt in DATE_FORMATS:
+        todo = parsed.isna()
+        if not todo.any():
+            break
+        parsed[todo] = pd.to_datetime(texts[todo], format=fmt, errors='coerce')
+
+    todo = parsed.isna()
+    if todo.any():
+        parsed[todo] = pd.to_datetime(texts[todo], format='mixed', errors='coerce')
+    return parsed
+
+
+def normalize_date_column(series):
+    """Vectorized normalize_date: turn a date column into datetime.date values.
+
+    Each distinct value is parsed only once (and remembered across calls),
+    missing values become None and values that do not parse are kept as-is.
+    """
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return series.dt.date.astype(object).where(series.notna(), None)
+
+    codes, uniques = pd.factorize(series)
+    if len(uniques) == 0:
+        return pd.Series([None] * len(series), index=series.index, dtype=object)
+
+    # An object array, so an Index of datetimes does not go through the deprecated datetime-to-str cast
+    texts = pd.Series(np.asarray(uniques, dtype=object)).astype(str).str.strip()
+    new = texts[~texts.isin(_DATE_CACHE.keys())].drop_duplicates()
+    if len(new):
+        if len(_DATE_CACHE) + len(new) > _DATE_CACHE_LIMIT:
+            # Start over with this column's values only, the ones it found cached are gone after the clear
+            _DATE_CACHE.clear()
+            new = texts.drop_duplicates()
+        parsed = _parse_dates(new)
+        _DATE_CACHE.update(zip(new, parsed.dt.date.where(parsed.notna(), None)))
+
+    mapped = np.array([_DATE_CACHE.get(t) for t in texts], dtype=object)
+    unparsed = pd.isnull(mapped)
+    mapped[unparsed] = np.asarray(uniques, dtype=object)[unparsed]
+
+    values = np.full(len(series), None, dtype=object)
+    valid = codes >= 0
+    values[valid] = mapped[codes[valid]]
+    return pd.Series(values, index=series.index, dtype=object)
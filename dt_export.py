@@ -0,0 +1,126 @@
+import os
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from dt_cache import HAVE_ARROW
+from dt_compare import as_text
+from dt_workspace import atomic_output
+
+# Diff export formats by extension; a bare format name puts the export next to the report as <report>_diffs.<ext>
+EXPORT_FORMATS = {'.parquet': 'parquet', '.pq': 'parquet', '.jsonl': 'jsonl', '.ndjson': 'jsonl', '.csv': 'csv'}
+EXPORT_EXTENSIONS = {'parquet': '.parquet', 'jsonl': '.jsonl', 'csv': '.csv'}
+DEFAULT_EXPORT = 'parquet' if HAVE_ARROW else 'csv'
+# Records are built and written this many at a time, so the export never holds a second copy of all diffs
+EXPORT_CHUNK_ROWS = 200_000
+EXPORT_FIELDS = ['column', 'left', 'right', 'status']
+# Stands in for the key when a file lacks a key column and align_on_key paired the rows by position
+ROW_FIELD = 'row_position'
+
+
+def export_path(out_path, export=None):
+    """Where the diff export goes: export itself if it is a file name, else <out_path stem>_diffs.<ext>."""
+    export = export or DEFAULT_EXPORT
+    if export in EXPORT_EXTENSIONS:
+        return os.path.splitext(out_path)[0] + '_diffs' + EXPORT_EXTENSIONS[export]
+    if os.path.splitext(export)[1].lower() not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown diff export '{export}': give parquet, jsonl, csv or a file name with one of "
+                         f"the extensions {', '.join(EXPORT_FORMATS)}.")
+    return export
+
+
+def export_keys(key, left_only, right_only):
+    """The key columns of the export, or [ROW_FIELD] when one of the files has no key column."""
+    keys = [key] if isinstance(key, str) else list(key)
+    # left_only and right_only keep all the columns of their file even when empty, like align_on_key checks
+    if all(k in left_only.columns and k in right_only.columns for k in keys):
+        return keys
+    return [ROW_FIELD]
+
+
+def _records(keys, column, left, right, status):
+    out = pd.DataFrame(keys)
+    out['column'] = column
+    out['left'] = left
+    out['right'] = right
+    out['status'] = status
+    return out
+
+
+def diff_frames(result_df, diffs, left_only, right_only, key='CELL_ID', chunk_rows=EXPORT_CHUNK_ROWS):
+    """Yield the differences of a comparison as long-format frames of at most chunk_rows records.
+
+    Columns: the key column(s), column, left, right and status, all text the
+    way the report shows it. Every DIFF cell is one record (status 'DIFF',
+    in row order), taken straight from the diff records, so no result row is
+    rendered; every row found in one file only is one record with status
+    ONLY_IN_FILE1 or ONLY_IN_FILE2 and no column or values. When a file has
+    no key column (see export_keys) the records carry the 0-based data row
+    instead: positional alignment pairs the first rows of both files and the
+    rows of the longer one follow.
+    """
+    keys = export_keys(key, left_only, right_only)
+    positional = keys == [ROW_FIELD]
+    order = np.argsort(diffs['row'].to_numpy(), kind='stable')
+    for start in range(0, len(order), chunk_rows):
+        part = diffs.iloc[order[start:start + chunk_rows]]
+        rows = part['row'].to_numpy()
+        key_values = ({ROW_FIELD: rows} if positional else
+                      {k: as_text(result_df[k].iloc[rows]).to_numpy() for k in keys})
+        yield _records(key_values, part['column'].astype(str).to_numpy(), part['left'].to_numpy(),
+                       part['right'].to_numpy(), 'DIFF')
+    for only, status in ((left_only, 'ONLY_IN_FILE1'), (right_only, 'ONLY_IN_FILE2')):
+        for start in range(0, len(only), chunk_rows):
+            part = only.iloc[start:start + chunk_rows]
+            key_values = ({ROW_FIELD: np.arange(start, start + len(part)) + len(result_df)} if positional else
+                          {k: as_text(part[k]).to_numpy() for k in keys})
+            yield _records(key_values, None, None, None, status)
+
+
+@contextmanager
+def diff_writer(path, key='CELL_ID'):
+    """Yield a write(frame) function appending diff_frames output to path, in the format of its extension.
+
+    key names the key columns of the frames (see export_keys; ROW_FIELD is
+    an integer, everything else text). Parquet goes through one pyarrow
+    writer (one row group per frame), JSON Lines and CSV are appended as
+    text. The file only appears once the block finishes without error; it
+    holds no records if write is never called.
+    """
+    fmt = EXPORT_FORMATS.get(os.path.splitext(path)[1].lower())
+    if fmt is None:
+        raise ValueError(f"Cannot tell the diff export format of {os.path.basename(path)}.")
+    names = ([key] if isinstance(key, str) else list(key)) + EXPORT_FIELDS
+
+    with atomic_output(path) as tmp_path:
+        if fmt == 'parquet':
+            if not HAVE_ARROW:
+                raise ImportError("A Parquet diff export needs pyarrow (pip install pyarrow), or use jsonl or csv.")
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            schema = pa.schema([(name, pa.int64() if name == ROW_FIELD else pa.string()) for name in names])
+            with pq.ParquetWriter(tmp_path, schema) as writer:
+                yield lambda frame: writer.write_table(pa.Table.from_pandas(frame, schema=schema,
+                                                                            preserve_index=False))
+            return
+
+        with open(tmp_path, 'w', newline='', encoding='utf-8') as f:
+            if fmt == 'csv':
+                pd.DataFrame(columns=names).to_csv(f, index=False)
+                yield lambda frame: frame.to_csv(f, header=False, index=False)
+            else:
+                def write(frame):
+                    if len(frame):
+                        f.write(frame.to_json(orient='records', lines=True).rstrip('\n') + '\n')
+                yield write
+
+
+def write_diff_export(path, result_df, diffs, left_only, right_only, key='CELL_ID'):
+    """Write the diff_frames of one comparison to path (Parquet, JSON Lines or CSV). Returns the number of records."""
+    count = 0
+    with diff_writer(path, export_keys(key, left_only, right_only)) as write:
+        for frame in diff_frames(result_df, diffs, left_only, right_only, key):
+            write(frame)
+            count += len(frame)
+    return count
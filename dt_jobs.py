@@ -0,0 +1,44 @@
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+
+import diskcache
+import psutil
+from dash import DiskcacheManager
+
+# How many comparisons may run at once across all server workers, and where jobs keep their state
+MAX_JOBS = int(os.environ.get('DT_COMPARE_MAX_JOBS', 2))
+JOB_DIR = os.environ.get('DT_COMPARE_JOB_DIR', os.path.join(tempfile.gettempdir(), 'dt_compare_jobs'))
+# A slot whose job died without releasing it is freed after this many seconds at the latest
+SLOT_TIMEOUT = int(os.environ.get('DT_COMPARE_SLOT_TIMEOUT', 3600))
+
+cache = diskcache.Cache(JOB_DIR)
+background_callback_manager = DiskcacheManager(cache)
+
+
+def _free_dead_slots():
+    # Cancelled jobs are terminated by Dash, so they never get to release their slot
+    for i in range(MAX_JOBS):
+        key = f'compare-slot-{i}'
+        pid = cache.get(key)
+        if pid is not None and not psutil.pid_exists(pid):
+            cache.delete(key)
+
+
+@contextmanager
+def job_slot(on_wait=None):
+    """Hold one of MAX_JOBS comparison slots, waiting (and calling on_wait) while all are busy."""
+    while True:
+        for i in range(MAX_JOBS):
+            key = f'compare-slot-{i}'
+            if cache.add(key, os.getpid(), expire=SLOT_TIMEOUT):
+                try:
+                    yield
+                finally:
+                    cache.delete(key)
+                return
+        if on_wait:
+            on_wait()
+        _free_dead_slots()
+        time.sleep(0.5)
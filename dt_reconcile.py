@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+
+from dt_compare import as_text
+
+# Quantity totals are reconciled per combination of these (standard) columns
+RECONCILE_BY = ['CAMPAIGN_CODE', 'TEMPLATE_CODE', 'PRIMARY_SOURCE_CODE']
+
+
+def _file2_values(result_df, diffs, columns):
+    # File 2 values of the matched rows: the File 1 value unless the cell is a DIFF, then the diff record's right text
+    out = {}
+    for col in columns:
+        values = as_text(result_df[col]).to_numpy(dtype=object, copy=True)
+        col_diffs = diffs[diffs['column'] == col]
+        values[col_diffs['row'].to_numpy()] = col_diffs['right'].to_numpy(dtype=object)
+        out[col] = values
+    return pd.DataFrame(out)
+
+
+def _group_totals(keys, quantity, by):
+    frame = keys.assign(_qty=pd.to_numeric(quantity, errors='coerce').to_numpy())
+    return frame.groupby(by, sort=False, observed=True)['_qty'].agg(['size', 'sum'])
+
+
+def over_threshold(table, threshold):
+    """Mask of the reconcile groups varying by at least threshold percent (or with File 2 at 0 but not File 1)."""
+    variance = table['Variance_Pct']
+    return (variance.abs() >= threshold) | (variance.isna() & (table['Quantity_Diff'] != 0))
+
+
+def reconcile(result_df, status, diffs, left_only, right_only, by=RECONCILE_BY, quantity='Quantity',
+              threshold=None):
+    """Total quantity per group on each side, with the difference and its variance.
+
+    Groups are the combinations of the by columns (those both files have),
+    taken as text the way the report shows them, and every row counts,
+    including those found in one file only. File 2 values are rebuilt from
+    the comparison itself (diff records), so this is one vectorized group-by
+    per side. Returns one row per group: its by values, Rows_File1/2,
+    Quantity_File1/2, Quantity_Diff (File 1 minus File 2, as next to Quantity
+    in the result) and Variance_Pct (Quantity_Diff as a percentage of the File
+    2 total), largest differences first. threshold keeps only the groups
+    whose variance is at least that many percent (or whose File 2 total is 0
+    while File 1's is not).
+    """
+    by = [col for col in by if col in status.columns]
+    if not by or quantity not in status.columns:
+        raise ValueError(f"Reconciliation needs {quantity} and at least one of {', '.join(RECONCILE_BY)} "
+                         f"compared in both files.")
+
+    keys1 = pd.concat([pd.DataFrame({col: as_text(result_df[col]) for col in by}),
+                       pd.DataFrame({col: as_text(left_only[col]) for col in by})], ignore_index=True)
+    qty1 = pd.concat([result_df[quantity].astype(object), left_only[quantity].astype(object)], ignore_index=True)
+    matched2 = _file2_values(result_df, diffs, by + [quantity])
+    keys2 = pd.concat([matched2[by], pd.DataFrame({col: as_text(right_only[col]) for col in by})], ignore_index=True)
+    # 'BLANK' stands for a missing quantity, to_numeric turns it into NaN
+    qty2 = pd.concat([matched2[quantity], right_only[quantity].astype(object)], ignore_index=True)
+
+    totals = _group_totals(keys1, qty1, by).join(_group_totals(keys2, qty2, by), how='outer', lsuffix='1', rsuffix='2')
+    totals = totals.fillna(0)
+    out = pd.DataFrame({
+        'Rows_File1': totals['size1'].astype(np.int64),
+        'Rows_File2': totals['size2'].astype(np.int64),
+        'Quantity_File1': totals['sum1'],
+        'Quantity_File2': totals['sum2'],
+        'Quantity_Diff': totals['sum1'] - totals['sum2'],
+    }, index=totals.index)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        variance = np.where(out['Quantity_File2'] != 0, out['Quantity_Diff'] / out['Quantity_File2'] * 100, np.nan)
+    out['Variance_Pct'] = np.round(variance, 2)
+    for col in ('Quantity_File1', 'Quantity_File2', 'Quantity_Diff'):
+        if (out[col] % 1 == 0).all():
+            out[col] = out[col].astype(np.int64)
+
+    if threshold is not None:
+        out = out[over_threshold(out, threshold)]
+    out = out.reset_index()
+    return out.iloc[np.argsort(-out['Quantity_Diff'].abs().to_numpy(), kind='stable')].reset_index(drop=True)
@@ -0,0 +1,234 @@
+import os
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.formatting.rule import FormulaRule
+from openpyxl.styles import Font, PatternFill
+from openpyxl.utils import get_column_letter
+
+from dt_compare import NOT_COMPARED, MATCH, DIFF, BLANK, render_result
+from dt_workspace import atomic_output
+
+RED_FONT = Font(color="FF0000")
+GREEN_FILL = PatternFill(start_color="CCFFCC", end_color="CCFFCC", fill_type="solid")
+GREY_FILL = PatternFill(start_color="D9D9D9", end_color="D9D9D9", fill_type="solid")
+HEADER_FONT = Font(bold=True)
+# Rows rendered into 'DIFF: v1 | v2' text at a time while writing, so the marked-up copy never exists in full
+RENDER_ROWS = 50_000
+# Column widths are measured on at most this many rows and never exceed MAX_WIDTH characters
+WIDTH_SAMPLE_ROWS = 20_000
+MAX_WIDTH = 60
+
+
+def _cell_values(df):
+    """Row values ready for openpyxl: NaN/NaT become empty cells."""
+    return df.astype(object).where(df.notna(), None).to_numpy()
+
+
+def column_widths(df, diffs=None, sample_rows=WIDTH_SAMPLE_ROWS, max_width=MAX_WIDTH):
+    """Width per column: longest value (or header) + 2, capped at max_width.
+
+    Frames longer than sample_rows are measured on a fixed random sample of
+    that many rows. With diffs the 'DIFF: v1 | v2' text each DIFF cell will
+    be rendered as counts too (diffs are few, so all of them are measured).
+    """
+    if len(df) > sample_rows:
+        df = df.sample(n=sample_rows, random_state=0)
+    diff_lengths = {}
+    if diffs is not None and len(diffs):
+        lengths = diffs['left'].str.len() + diffs['right'].str.len() + len('DIFF:  | ')
+        diff_lengths = lengths.groupby(diffs['column'], observed=True).max().to_dict()
+
+    widths = []
+    for col in df.columns:
+        values = df[col]
+        text = values[values.notna()].astype(str)
+        longest = text[text != ''].str.len().max() if len(text) else 0
+        longest = 0 if pd.isna(longest) else int(longest)
+        widest = max(longest, len(str(col)), int(diff_lengths.get(col, 0)))
+        widths.append(min(widest + 2, max_width))
+    return widths
+
+
+def _rendered_blocks(df, status, diffs):
+    # (rendered rows, their status) RENDER_ROWS at a time; without diffs df is already rendered
+    if diffs is None:
+        yield df, status
+        return
+    diffs = diffs.sort_values('row', kind='stable')
+    rows = diffs['row'].to_numpy()
+    for start in range(0, len(df), RENDER_ROWS):
+        stop = start + RENDER_ROWS
+        lo, hi = np.searchsorted(rows, [start, stop])
+        block_status = status.iloc[start:stop]
+        block_diffs = diffs.iloc[lo:hi].assign(row=rows[lo:hi] - start)
+        yield render_result(df.iloc[start:stop], block_status, block_diffs), block_status
+
+
+def _compared_ranges(df, status):
+    """Space-separated ranges (e.g. 'A2:C101 E2:E101') covering the compared columns below the header."""
+    positions = sorted(df.columns.get_loc(col) + 1 for col in status.columns)
+    last_row = len(df) + 1
+    runs = []
+    for pos in positions:
+        if runs and runs[-1][1] == pos - 1:
+            runs[-1][1] = pos
+        else:
+            runs.append([pos, pos])
+    return ' '.join(f'{get_column_letter(a)}2:{get_column_letter(b)}{last_row}' for a, b in runs)
+
+
+def _add_status_rules(ws, df, status):
+    # The rendered text already says what each cell is, so three rules cover the whole sheet:
+    # 'DIFF: ...' -> red font, 'BLANK' -> grey, anything else in a compared column -> green
+    sqref = _compared_ranges(df, status)
+    if not sqref or df.empty:
+        return
+    top_left = sqref.split(':')[0]
+    ws.conditional_formatting.add(sqref, FormulaRule(formula=[f'LEFT({top_left},5)="DIFF:"'],
+                                                     font=RED_FONT, stopIfTrue=True))
+    ws.conditional_formatting.add(sqref, FormulaRule(formula=[f'{top_left}="BLANK"'],
+                                                     fill=GREY_FILL, stopIfTrue=True))
+    ws.conditional_formatting.add(sqref, FormulaRule(formula=['TRUE'], fill=GREEN_FILL))
+
+
+def _write_sheet(wb, title, df, status=None, styling='cells', diffs=None):
+    ws = wb.create_sheet(title)
+    # Write-only sheets take their column widths before the first row
+    for col_idx, width in enumerate(column_widths(df, diffs), start=1):
+        ws.column_dimensions[get_column_letter(col_idx)].width = width
+
+    header = []
+    for col in df.columns:
+        cell = WriteOnlyCell(ws, value=str(col))
+        cell.font = HEADER_FONT
+        header.append(cell)
+    ws.append(header)
+
+    if status is None:
+        for row in _cell_values(df):
+            ws.append(list(row))
+        return
+
+    for block, block_status in _rendered_blocks(df, status, diffs):
+        if styling == 'conditional':
+            for row in _cell_values(block):
+                ws.append(list(row))
+            continue
+
+        codes = block_status.reindex(columns=df.columns, fill_value=NOT_COMPARED).to_numpy(dtype=np.uint8)
+        for values, row_codes in zip(_cell_values(block), codes):
+            row = []
+            for value, code in zip(values, row_codes):
+                if code == NOT_COMPARED:
+                    row.append(value)
+                    continue
+                cell = WriteOnlyCell(ws, value=value)
+                if code == DIFF:
+                    cell.font = RED_FONT
+                elif code == MATCH:
+                    cell.fill = GREEN_FILL
+                elif code == BLANK:
+                    cell.fill = GREY_FILL
+                row.append(cell)
+            ws.append(row)
+
+    if styling == 'conditional':
+        _add_status_rules(ws, df, status)
+
+
+def write_report(out_path, result_df, status, left_only=None, right_only=None, keep_sheets_from=None,
+                 styling='cells', diffs=None, reconciliation=None):
+    """Write the Comparison_Result workbook in one pass with openpyxl's write-only mode.
+
+    With styling='cells' each cell is styled from the status matrix as the
+    rows are written, so the workbook is never reloaded. styling='conditional'
+    writes plain values and three conditional-formatting rules instead, which
+    keeps the styling cost and the file size flat however many cells there are.
+    Sheets of keep_sheets_from (usually the uploaded Data Tab) are copied
+    over as values only, without their formatting, so keep_sheets_from must
+    not be out_path: the source workbook is never rewritten. The file is
+    replaced atomically. With diffs (from compare_frames) result_df holds
+    plain values and the DIFF/BLANK markers are rendered block by block as
+    the rows are written; without, result_df is taken as already rendered.
+    reconciliation (see dt_reconcile.reconcile) goes to a Reconciliation sheet.
+    """
+    if styling not in ('cells', 'conditional'):
+        raise ValueError(f"Unknown styling '{styling}', expected 'cells' or 'conditional'.")
+    if keep_sheets_from and os.path.abspath(keep_sheets_from) == os.path.abspath(out_path):
+        # Copied sheets lose fonts, merged cells, widths and number formats, so the source must stay as it is
+        raise ValueError(f"The report cannot be written over {os.path.basename(out_path)}, the workbook whose "
+                         f"sheets it copies; give a separate out_path.")
+
+    wb = Workbook(write_only=True)
+    written = {'Comparison_Result', 'Only_In_File1', 'Only_In_File2', 'Reconciliation'}
+
+    if keep_sheets_from:
+        src = load_workbook(keep_sheets_from, read_only=True)
+        try:
+            for src_ws in src.worksheets:
+                if src_ws.title in written:
+                    continue
+                ws = wb.create_sheet(src_ws.title)
+                for row in src_ws.iter_rows(values_only=True):
+                    ws.append(row)
+        finally:
+            src.close()
+
+    _write_sheet(wb, 'Comparison_Result', result_df, status, styling, diffs)
+    if left_only is not None and not left_only.empty:
+        _write_sheet(wb, 'Only_In_File1', left_only)
+    if right_only is not None and not right_only.empty:
+        _write_sheet(wb, 'Only_In_File2', right_only)
+    if reconciliation is not None:
+        _write_sheet(wb, 'Reconciliation', reconciliation)
+
+    with atomic_output(out_path) as tmp_path:
+        wb.save(tmp_path)
+    return out_path
+
+
+def _sheet_title(name, suffix, used):
+    # Excel sheet names: at most 31 characters, none of []:*?/\, unique in the workbook
+    base = ''.join('_' if ch in '[]:*?/\\' else ch for ch in str(name))
+    title = base[:31 - len(suffix)] + suffix
+    n = 2
+    while title.lower() in used:
+        tag = f'{suffix} ({n})'
+        title = base[:31 - len(tag)] + tag
+        n += 1
+    used.add(title.lower())
+    return title
+
+
+def write_sheet_reports(out_path, reports, overview, styling='cells'):
+    """Write the comparisons of several sheet pairs into one workbook in one write-only pass.
+
+    Each report is (name, result_df, status, diffs, left_only, right_only)
+    and gets a result sheet titled name plus "name only 1" / "name only 2"
+    sheets for unpaired rows; titles are cut to Excel's 31 characters and
+    made unique. overview (one row per pair, its 'Pair' column holding the
+    report names) becomes the first sheet, with the result sheet of each
+    pair added as 'Result sheet'.
+    """
+    if styling not in ('cells', 'conditional'):
+        raise ValueError(f"Unknown styling '{styling}', expected 'cells' or 'conditional'.")
+
+    used = {'overview'}
+    titles = [[_sheet_title(report[0], suffix, used) for suffix in ('', ' only 1', ' only 2')] for report in reports]
+    result_titles = {report[0]: t[0] for report, t in zip(reports, titles)}
+
+    wb = Workbook(write_only=True)
+    _write_sheet(wb, 'Overview', overview.assign(**{'Result sheet': overview['Pair'].map(result_titles)}))
+    for (name, result_df, status, diffs, left_only, right_only), (title, title1, title2) in zip(reports, titles):
+        _write_sheet(wb, title, result_df, status, styling, diffs)
+        if left_only is not None and not left_only.empty:
+            _write_sheet(wb, title1, left_only)
+        if right_only is not None and not right_only.empty:
+            _write_sheet(wb, title2, right_only)
+
+    with atomic_output(out_path) as tmp_path:
+        wb.save(tmp_path)
+    return out_path
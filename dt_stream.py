@@ -0,0 +1,190 @@
+import os
+import pickle
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+from dt_compare import (COLUMN_MAPPING, apply_mapping, align_on_key, compare_frames, normalize_key, render_result,
+                        summarize)
+from dt_export import diff_frames, diff_writer
+
+# Rows are spread over N_BUCKETS spill files per level by key hash. A bucket that is
+# still bigger than the chunk size is split again on the next 6 bits of the hash.
+N_BUCKETS = 64
+MAX_LEVEL = 10
+
+
+def read_chunks(path, header=0, chunksize=100_000):
+    """Yield the first sheet of an xlsx (or a CSV or Parquet file) as object DataFrames of at most chunksize rows."""
+    if path.lower().endswith('.csv'):
+        with open(path, 'rb') as f:
+            # Lines above the header are skipped by hand so blank ones count, as in dt_workbook.read_table
+            for _ in range(header):
+                f.readline()
+            yield from pd.read_csv(f, chunksize=chunksize, dtype=object)
+        return
+    if path.lower().endswith(('.parquet', '.pq')):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas().astype(object)
+        return
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        for _ in range(header):
+            next(rows, None)
+        header_row = next(rows, ())
+        columns = [str(c) if c is not None else f'Unnamed: {i}' for i, c in enumerate(header_row)]
+        width = len(columns)
+
+        batch = []
+        for row in rows:
+            if all(v is None for v in row):
+                continue
+            batch.append(row[:width] + (None,) * (width - len(row)))
+            if len(batch) >= chunksize:
+                yield pd.DataFrame(batch, columns=columns, dtype=object)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=columns, dtype=object)
+    finally:
+        wb.close()
+
+
+def _read_spill(path):
+    """Yield the frames pickled one after another into a spill file."""
+    if not os.path.exists(path):
+        return
+    with open(path, 'rb') as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+
+def _load_bucket(path, columns):
+    frames = list(_read_spill(path))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=columns)
+
+
+def _partition(chunks, keys, out_dir, level):
+    """Spread chunks over N_BUCKETS spill files by key hash. Returns (rows per bucket, columns)."""
+    os.makedirs(out_dir, exist_ok=True)
+    counts = np.zeros(N_BUCKETS, dtype=np.int64)
+    columns = None
+    files = {}
+    try:
+        for chunk in chunks:
+            missing = [k for k in keys if k not in chunk.columns]
+            if missing:
+                raise ValueError(f"Key column(s) {missing} not found, streaming mode needs a key.")
+            columns = chunk.columns
+            hashes = pd.util.hash_pandas_object(
+                pd.DataFrame({k: normalize_key(chunk[k]) for k in keys}), index=False).to_numpy()
+            buckets = (hashes >> np.uint64(6 * level)) % np.uint64(N_BUCKETS)
+            for b in np.unique(buckets):
+                part = chunk[buckets == b]
+                if b not in files:
+                    files[b] = open(os.path.join(out_dir, f'{b}.pkl'), 'wb')
+                pickle.dump(part, files[b], protocol=pickle.HIGHEST_PROTOCOL)
+                counts[b] += len(part)
+    finally:
+        for f in files.values():
+            f.close()
+    return counts, columns
+
+
+def _append_csv(df, path):
+    df.to_csv(path, mode='a', header=not os.path.exists(path), index=False)
+
+
+def _compare_partitions(chunks1, chunks2, keys, work_dir, level, chunksize, prepare, outputs, totals):
+    dir1 = os.path.join(work_dir, 'file1')
+    dir2 = os.path.join(work_dir, 'file2')
+    counts1, columns1 = _partition(chunks1, keys, dir1, level)
+    counts2, columns2 = _partition(chunks2, keys, dir2, level)
+
+    for b in range(N_BUCKETS):
+        if counts1[b] + counts2[b] == 0:
+            continue
+        spill1 = os.path.join(dir1, f'{b}.pkl')
+        spill2 = os.path.join(dir2, f'{b}.pkl')
+
+        if counts1[b] + counts2[b] > 2 * chunksize and level + 1 < MAX_LEVEL:
+            _compare_partitions(_read_spill(spill1), _read_spill(spill2), keys,
+                                os.path.join(work_dir, str(b)), level + 1, chunksize, prepare, outputs, totals)
+        else:
+            df1 = _load_bucket(spill1, keys if columns1 is None else columns1)
+            df2 = _load_bucket(spill2, keys if columns2 is None else columns2)
+            if prepare:
+                df1, df2 = prepare(df1, df2)
+
+            df1, df2, left_only, right_only = align_on_key(df1, df2, keys, verbose=False)
+            result_df, status, diffs = compare_frames(df1, df2)
+
+            if 'result' in outputs:
+                _append_csv(render_result(result_df, status, diffs), outputs['result'])
+                if not left_only.empty:
+                    _append_csv(left_only, outputs['left_only'])
+                if not right_only.empty:
+                    _append_csv(right_only, outputs['right_only'])
+            if 'diffs' in outputs:
+                for frame in diff_frames(result_df, diffs, left_only, right_only, keys):
+                    outputs['diffs'](frame)
+            for name, count in summarize(status, left_only, right_only).items():
+                totals[name] += count
+
+        # Done with this bucket, free the disk space before moving on
+        for path in (spill1, spill2):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def compare_streaming(file1_path, file2_path, out_path, key='CELL_ID', header1=0, header2=0,
+                      chunksize=100_000, mapping=COLUMN_MAPPING, prepare=None, diff_path=None, diffs_only=False):
+    """Compare two files that do not fit in memory and write the result to CSV as it goes.
+
+    Both inputs are read chunksize rows at a time, renamed with mapping and
+    hash-partitioned on key into spill files, then each partition pair is
+    aligned and compared on its own, so peak memory follows chunksize rather
+    than file size. prepare(df1, df2) runs on every partition pair before the
+    comparison. Rows found in one file only go to <out>_only_in_file1.csv and
+    <out>_only_in_file2.csv. Output rows are grouped by partition, not sorted.
+    diff_path also streams the long-format diff export there (see
+    dt_export.diff_frames), and with diffs_only it is the only output.
+    Returns the summed dt_compare.summarize counts.
+    """
+    keys = [key] if isinstance(key, str) else list(key)
+    stem = os.path.splitext(out_path)[0]
+    outputs = {} if diffs_only else {
+        'result': out_path,
+        'left_only': f'{stem}_only_in_file1.csv',
+        'right_only': f'{stem}_only_in_file2.csv',
+    }
+    for path in outputs.values():
+        if os.path.exists(path):
+            os.remove(path)
+
+    totals = {'matched': 0, 'left_only': 0, 'right_only': 0, 'diff_rows': 0, 'diff_cells': 0}
+    work_dir = tempfile.mkdtemp(prefix='dt_stream_')
+    try:
+        chunks1 = (apply_mapping(c, mapping) for c in read_chunks(file1_path, header1, chunksize))
+        chunks2 = (apply_mapping(c, mapping) for c in read_chunks(file2_path, header2, chunksize))
+        if diff_path:
+            with diff_writer(diff_path, keys) as write:
+                outputs['diffs'] = write
+                _compare_partitions(chunks1, chunks2, keys, work_dir, 0, chunksize, prepare, outputs, totals)
+        else:
+            _compare_partitions(chunks1, chunks2, keys, work_dir, 0, chunksize, prepare, outputs, totals)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print(f"Matched rows: {totals['matched']}, only in file 1: {totals['left_only']}, "
+          f"only in file 2: {totals['right_only']}")
+    print(f"✅ Streaming comparison saved to {diff_path if diffs_only else out_path}")
+    return totals
@@ -0,0 +1,89 @@
+import json
+import logging
+import os
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+import psutil
+
+# One JSON object per finished stage goes to this logger: to stderr by default, to the file DT_COMPARE_STAGE_LOG
+# names when that is set, nowhere with DT_COMPARE_STAGE_LOG=off
+logger = logging.getLogger('dt_compare.stages')
+STAGE_LOG = os.environ.get('DT_COMPARE_STAGE_LOG', '')
+# tracemalloc makes pandas code noticeably slower, so Python-level peaks are only measured on request
+TRACE_MEMORY = os.environ.get('DT_COMPARE_TRACEMALLOC', '0') == '1'
+
+if STAGE_LOG.lower() != 'off':
+    _handler = logging.FileHandler(STAGE_LOG, encoding='utf-8') if STAGE_LOG else logging.StreamHandler(sys.stderr)
+    _handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    # The records already have a handler, an application logging config must not print them a second time
+    logger.propagate = False
+
+# Stages currently running, innermost last, so nested stages can share the tracemalloc peak
+_open = []
+
+
+def _peak_rss_mb():
+    mem = psutil.Process().memory_info()
+    if hasattr(mem, 'peak_wset'):
+        return mem.peak_wset / 2 ** 20
+    import resource
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2 ** 20
+
+
+@contextmanager
+def stage(name, records=None, **counts):
+    """Time the block as pipeline stage name and log it as one JSON line.
+
+    Yields a dict the block can add counts to (rows, cells, ...). The record
+    holds the wall time, the process RSS at the end and its peak so far and,
+    with DT_COMPARE_TRACEMALLOC=1, the peak Python allocation during the
+    block. It is appended to records when a list is given.
+    """
+    info = dict(counts)
+    if TRACE_MEMORY and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    tracing = tracemalloc.is_tracing()
+    if tracing:
+        # Resetting the peak for this stage must not lose what the enclosing stages have seen so far
+        peak = tracemalloc.get_traced_memory()[1]
+        for outer in _open:
+            outer['py_peak'] = max(outer['py_peak'], peak)
+        tracemalloc.reset_peak()
+    state = {'py_peak': 0}
+    _open.append(state)
+    start = time.perf_counter()
+    try:
+        yield info
+    finally:
+        seconds = time.perf_counter() - start
+        _open.remove(state)
+        record = {'stage': name, 'seconds': round(seconds, 4)}
+        record.update(info)
+        rss = psutil.Process().memory_info().rss / 2 ** 20
+        record['rss_mb'] = round(rss, 1)
+        record['peak_rss_mb'] = round(max(rss, _peak_rss_mb()), 1)
+        if tracing:
+            peak = max(state['py_peak'], tracemalloc.get_traced_memory()[1])
+            for outer in _open:
+                outer['py_peak'] = max(outer['py_peak'], peak)
+            record['py_peak_mb'] = round(peak / 2 ** 20, 1)
+        if records is not None:
+            records.append(record)
+        logger.info(json.dumps(record, default=str))
+
+
+def format_stages(records):
+    """Plain-text table of stage records, for printing at the end of a run."""
+    lines = [f"{'stage':<20} {'seconds':>9} {'rss MB':>8} {'peak MB':>8}  counts"]
+    for r in records:
+        extra = ', '.join(f'{k}={v}' for k, v in r.items()
+                          if k not in ('stage', 'seconds', 'rss_mb', 'peak_rss_mb', 'py_peak_mb'))
+        lines.append(f"{r['stage']:<20} {r['seconds']:>9.3f} {r['rss_mb']:>8.1f} {r['peak_rss_mb']:>8.1f}  {extra}")
+    return '\n'.join(lines)
@@ -0,0 +1,71 @@
+import os
+
+from dash import dcc, html
+from flask import abort, jsonify, request
+from werkzeug.utils import secure_filename
+
+from dt_workspace import new_workspace, workspace_path
+
+# Bytes are copied from the request body to disk this many at a time
+COPY_CHUNK = 1024 * 1024
+
+
+def upload_path(upload_id):
+    """Path of the file stored for upload_id, or None if there is no such upload."""
+    workspace = workspace_path(upload_id)
+    if workspace is None:
+        return None
+    # The upload sits alone in <workspace>/upload, anything a job writes goes next to that folder
+    folder = os.path.join(workspace, 'upload')
+    files = os.listdir(folder) if os.path.isdir(folder) else []
+    return os.path.join(folder, files[0]) if len(files) == 1 else None
+
+
+def register_upload_routes(server):
+    """Add the streaming upload endpoints used by assets/chunked_upload.js to the Flask server.
+
+    POST /upload?filename=x starts an upload in a new workspace and returns its id,
+    PUT /upload/<id>?offset=n appends the request body if n is the current size
+    (a 409 with the real size lets the client resume) and GET /upload/<id> reports the size.
+    """
+    @server.route('/upload', methods=['POST'])
+    def start_upload():
+        filename = secure_filename(request.args.get('filename', ''))
+        if not filename:
+            return jsonify(error="filename is required"), 400
+        workspace = new_workspace()
+        os.makedirs(os.path.join(workspace, 'upload'))
+        open(os.path.join(workspace, 'upload', filename), 'wb').close()
+        return jsonify(upload_id=os.path.basename(workspace), filename=filename, size=0)
+
+    @server.route('/upload/<upload_id>', methods=['GET', 'PUT'])
+    def upload_chunk(upload_id):
+        path = upload_path(upload_id)
+        if path is None:
+            abort(404)
+        size = os.path.getsize(path)
+
+        if request.method == 'PUT':
+            offset = request.args.get('offset', type=int)
+            if offset != size:
+                return jsonify(error="offset does not match the stored size", size=size), 409
+            with open(path, 'ab') as f:
+                while True:
+                    chunk = request.stream.read(COPY_CHUNK)
+                    if not chunk:
+                        break
+                    f.write(chunk)
+            size = os.path.getsize(path)
+
+        return jsonify(upload_id=upload_id, filename=os.path.basename(path), size=size)
+
+
+def chunked_upload(component_id, label, accept):
+    """Click/drop target that streams to /upload; dcc.Store component_id receives {'upload_id', 'filename', 'size'}."""
+    # Dash has no file <input>, assets/chunked_upload.js opens one when the button is clicked
+    return html.Div([
+        html.Button(label, className='chunked-upload', id=f'{component_id}-button',
+                    **{'data-store': component_id, 'data-accept': accept}),
+        html.Div(id=f'{component_id}-status', style={'marginTop': '5px'}),
+        dcc.Store(id=component_id),
+    ])
@@ -0,0 +1,185 @@
+import csv
+import importlib.util
+import os
+import zipfile
+
+import pandas as pd
+from openpyxl import load_workbook
+
+from dt_cache import HAVE_ARROW, cached_call, read_cached
+
+# calamine (Rust) parses xlsx several times faster than openpyxl; pandas uses it when python-calamine is installed
+ENGINE = 'calamine' if importlib.util.find_spec('python_calamine') else None
+# pyarrow's CSV reader is multithreaded, pandas' own C parser is the fallback
+CSV_ENGINE = 'pyarrow' if HAVE_ARROW else 'c'
+WORKBOOK_EXTENSIONS = ('.xlsx', '.xlsm', '.xls')
+# detect_header looks for the header among this many rows at the top of the sheet
+HEADER_SCAN_ROWS = 50
+
+
+def file_format(path):
+    """'csv', 'parquet' or 'excel' by extension, None for anything else."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.csv':
+        return 'csv'
+    if ext in ('.parquet', '.pq'):
+        return 'parquet'
+    if ext in WORKBOOK_EXTENSIONS:
+        return 'excel'
+    return None
+
+
+def check_workbook(path):
+    """Raise ValueError unless path looks like an xlsx workbook. Only the zip directory is read, no sheet is parsed."""
+    name = os.path.basename(path)
+    if not zipfile.is_zipfile(path):
+        raise ValueError(f"{name} is not a valid .xlsx file.")
+    with zipfile.ZipFile(path) as zf:
+        if 'xl/workbook.xml' not in zf.namelist():
+            raise ValueError(f"{name} is not a valid .xlsx file.")
+
+
+def mapped_columns(mapping):
+    """Every source column name the mapping knows about, for read_sheet(columns=...)."""
+    return sorted({v for variants in mapping.values() for v in variants})
+
+
+def _wanted(columns):
+    # Column filter comparing names case-insensitively, as apply_mapping does
+    wanted = {str(c).strip().upper() for c in columns}
+    return lambda name: str(name).strip().upper() in wanted
+
+
+def read_table(path, header=0, columns=None):
+    """Read a CSV or Parquet file straight into a frame, without going through a workbook.
+
+    header is the CSV line holding the column names, counted like workbook
+    rows (blank lines included; Parquet stores its names) and columns limits
+    reading to those names, like read_sheet.
+    """
+    if file_format(path) == 'parquet':
+        if columns is None:
+            return pd.read_parquet(path)
+        import pyarrow.parquet as pq
+        keep = _wanted(columns)
+        return pd.read_parquet(path, columns=[n for n in pq.read_schema(path).names if keep(n)])
+
+    with open(path, 'rb') as f:
+        # The lines above the header are skipped here, the CSV readers would not count blank ones
+        for _ in range(header):
+            f.readline()
+        usecols = None
+        if columns is not None:
+            # The pyarrow engine takes a list of names only, so the header line is read first
+            start = f.tell()
+            names = pd.read_csv(f, nrows=0).columns
+            f.seek(start)
+            usecols = [n for n in names if _wanted(columns)(n)]
+        return pd.read_csv(f, usecols=usecols, engine=CSV_ENGINE)
+
+
+def read_sheet(path, sheet=0, header=0, columns=None, engine=ENGINE):
+    """Parse one sheet (the first by default) with a single open of the workbook.
+
+    columns limits parsing to those column names (compared case-insensitively,
+    as apply_mapping does); names the sheet does not have are skipped.
+    CSV and Parquet files are handed to read_table, sheet does not apply to them.
+    """
+    if file_format(path) in ('csv', 'parquet'):
+        return read_table(path, header=header, columns=columns)
+    usecols = _wanted(columns) if columns is not None else None
+    return pd.read_excel(path, sheet_name=sheet, header=header, usecols=usecols, engine=engine)
+
+
+def load_sheet(path, sheet=0, header=0, columns=None):
+    """read_sheet through the content-addressed cache, so a file parsed before is not parsed again."""
+    columns = sorted(columns) if columns is not None else None
+    return read_cached(path, read_sheet, sheet=sheet, header=header, columns=columns, engine=ENGINE)
+
+
+def _top_rows(path, sheet, max_rows):
+    # The first max_rows rows as tuples of cell values, without parsing the rest of the file
+    if file_format(path) == 'csv':
+        with open(path, newline='', encoding='utf-8-sig', errors='replace') as f:
+            return [tuple(next(csv.reader([line]), ())) for _, line in zip(range(max_rows), f)]
+    if path.lower().endswith('.xls'):
+        # openpyxl cannot open the old binary format
+        top = pd.read_excel(path, sheet_name=sheet, header=None, nrows=max_rows)
+        return [tuple(v for v in row if pd.notna(v)) for row in top.itertuples(index=False)]
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[sheet] if isinstance(sheet, int) else wb[sheet]
+        # Count rows from A1 whatever the stored dimensions say, as pandas does
+        ws.reset_dimensions()
+        return list(ws.iter_rows(max_row=max_rows, values_only=True))
+    finally:
+        wb.close()
+
+
+def score_header_rows(path, names, sheet=0, max_rows=HEADER_SCAN_ROWS):
+    """How many of names (case-insensitive) each of the first max_rows rows holds, as a list."""
+    wanted = {str(n).strip().upper() for n in names}
+    return [len({str(v).strip().upper() for v in row if v is not None} & wanted)
+            for row in _top_rows(path, sheet, max_rows)]
+
+
+def detect_header(path, names, sheet=0, max_rows=HEADER_SCAN_ROWS, min_matches=2, default=None):
+    """Row number of the header: the first of the top max_rows rows holding the most of names.
+
+    Only those rows are read (openpyxl read-only for workbooks), and the
+    scores are cached by file content, so the full parse that follows is
+    the only one. When no row holds min_matches names, default is returned,
+    or ValueError raised if there is none. Parquet files always give 0.
+    """
+    if file_format(path) == 'parquet':
+        return 0
+    scores = cached_call(path, score_header_rows, names=sorted(names), sheet=sheet, max_rows=max_rows)
+    best = max(range(len(scores)), key=lambda i: (scores[i], -i), default=None)
+    if best is None or scores[best] < min_matches:
+        if default is not None:
+            return default
+        raise ValueError(f"No header row found in the first {max_rows} rows of {os.path.basename(path)}: "
+                         f"none has {min_matches} of the expected column names.")
+    return best
+
+
+def sheet_names(path):
+    """Names of the sheets of a workbook, in workbook order, without parsing any of them."""
+    if file_format(path) != 'excel':
+        raise ValueError(f"{os.path.basename(path)} is not a workbook, it has no sheets to pair.")
+    if path.lower().endswith('.xls'):
+        return pd.ExcelFile(path).sheet_names
+    wb = load_workbook(path, read_only=True)
+    try:
+        return wb.sheetnames
+    finally:
+        wb.close()
+
+
+def pair_sheets(path1, path2, sheet_map=None):
+    """Pairs of sheet names (sheet1, sheet2) to compare between two workbooks.
+
+    Without sheet_map every sheet of path1 is paired with the path2 sheet of
+    the same name (case-insensitive, ignoring surrounding spaces); sheets
+    without a partner are left out. sheet_map is a dict {sheet1: sheet2} or a
+    list of 'sheet1=sheet2' (or just 'name' for the same name on both sides)
+    strings; its sheets must exist, they are looked up like the pairing by name.
+    """
+    names1, names2 = sheet_names(path1), sheet_names(path2)
+    if sheet_map is None:
+        by_name = {str(n).strip().upper(): n for n in names2}
+        return [(n, by_name[str(n).strip().upper()]) for n in names1 if str(n).strip().upper() in by_name]
+
+    if not isinstance(sheet_map, dict):
+        sheet_map = dict((item.split('=', 1) * 2)[:2] for item in sheet_map)
+
+    def resolve(sheet, names, path):
+        # Exact name first, then the same comparison as the pairing by name
+        if sheet in names:
+            return sheet
+        match = [n for n in names if str(n).strip().upper() == str(sheet).strip().upper()]
+        if not match:
+            raise ValueError(f"{os.path.basename(path)} has no sheet '{sheet}'.")
+        return match[0]
+
+    return [(resolve(a, names1, path1), resolve(b, names2, path2)) for a, b in sheet_map.items()]
@@ -0,0 +1,66 @@
+import os
+import re
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+
+# Every comparison job gets its own directory under WORKSPACE_ROOT, removed WORKSPACE_TTL seconds after its last change
+WORKSPACE_ROOT = os.environ.get('DT_COMPARE_WORKSPACE_DIR',
+                                os.path.join(tempfile.gettempdir(), 'dt_compare_workspaces'))
+WORKSPACE_TTL = int(os.environ.get('DT_COMPARE_WORKSPACE_TTL', 6 * 3600))
+_JOB_ID = re.compile(r'^job_[A-Za-z0-9_]+$')
+
+
+def cleanup_workspaces(ttl=WORKSPACE_TTL):
+    """Remove job directories that have not been touched for ttl seconds."""
+    if not os.path.isdir(WORKSPACE_ROOT):
+        return
+    cutoff = time.time() - ttl
+    for entry in os.scandir(WORKSPACE_ROOT):
+        try:
+            if entry.is_dir() and entry.stat().st_mtime < cutoff:
+                shutil.rmtree(entry.path, ignore_errors=True)
+        except FileNotFoundError:
+            # Another worker cleaned it up first
+            continue
+
+
+def new_workspace():
+    """Create a uniquely named directory for one comparison job and return its path."""
+    cleanup_workspaces()
+    os.makedirs(WORKSPACE_ROOT, exist_ok=True)
+    return tempfile.mkdtemp(prefix='job_', dir=WORKSPACE_ROOT)
+
+
+def workspace_path(job_id):
+    """Directory of the workspace named job_id (as handed to the browser), or None if it does not exist."""
+    if not job_id or not _JOB_ID.match(job_id):
+        return None
+    path = os.path.join(WORKSPACE_ROOT, job_id)
+    return path if os.path.isdir(path) else None
+
+
+def remove_workspace(path):
+    shutil.rmtree(path, ignore_errors=True)
+
+
+@contextmanager
+def atomic_output(path):
+    """Yield a temp path next to path and move it into place only if the block succeeds."""
+    directory, name = os.path.split(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=f'.{name}.', suffix=os.path.splitext(name)[1], dir=directory)
+    os.close(fd)
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def atomic_write(path, data):
+    """Write bytes to path so that readers never see a half-written file."""
+    with atomic_output(path) as tmp_path:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
@@ -0,0 +1,10 @@
+import os
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Keep the test runs out of the shared cache and workspace directories (read when the modules are imported)
+os.environ.setdefault('DT_COMPARE_CACHE_DIR', tempfile.mkdtemp(prefix='dt_compare_test_cache_'))
+os.environ.setdefault('DT_COMPARE_WORKSPACE_DIR', tempfile.mkdtemp(prefix='dt_compare_test_workspaces_'))
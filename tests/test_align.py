@@ -0,0 +1,79 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from dt_compare import align_on_key, normalize_key
+
+
+def reference_align(df1, df2, keys):
+    # Plain loops: the n-th row with a key pairs with the n-th row of the other file with that key, blank keys never pair
+    def occurrences(df):
+        normalized = pd.DataFrame({k: normalize_key(df[k]) for k in keys})
+        seen, out = {}, []
+        for pos, key in enumerate(map(tuple, normalized.to_numpy())):
+            if all(part == '' for part in key):
+                out.append((None, pos))
+                continue
+            seen[key] = seen.get(key, -1) + 1
+            out.append(((key, seen[key]), pos))
+        return out
+
+    occ1, occ2 = occurrences(df1), occurrences(df2)
+    pos2 = {k: pos for k, pos in occ2 if k is not None}
+    pos1 = {k: pos for k, pos in occ1 if k is not None}
+    matched = sorted((k, pos, pos2[k]) for k, pos in occ1 if k in pos2)
+    left_only = [pos for k, pos in occ1 if k is None] + [pos for k, pos in sorted(pos1.items()) if k not in pos2]
+    right_only = [pos for k, pos in occ2 if k is None] + [pos for k, pos in sorted(pos2.items()) if k not in pos1]
+    return [m[1] for m in matched], [m[2] for m in matched], left_only, right_only
+
+
+def frames(seed, n=300, blank_rate=0.05):
+    rng = np.random.default_rng(seed)
+
+    def one(rows):
+        key = rng.choice([f'L{i}' for i in range(60)] + [' L7 ', 'L8'], rows).astype(object)
+        key[rng.random(rows) < blank_rate] = None
+        key[rng.random(rows) < blank_rate] = ''
+        return pd.DataFrame({'CELL_ID': key, 'POID': rng.choice(['P1', 'P2', None], rows),
+                             'row_id': np.arange(rows)})
+    return one(n), one(n + 17)
+
+
+@pytest.mark.parametrize('seed', range(5))
+@pytest.mark.parametrize('keys', [['CELL_ID'], ['CELL_ID', 'POID']])
+def test_align_matches_reference(seed, keys):
+    df1, df2 = frames(seed)
+    left, right, left_only, right_only = align_on_key(df1, df2, keys, verbose=False)
+    ref_left, ref_right, ref_left_only, ref_right_only = reference_align(df1, df2, keys)
+
+    assert left['row_id'].tolist() == ref_left
+    assert right['row_id'].tolist() == ref_right
+    assert left_only['row_id'].tolist() == ref_left_only
+    assert right_only['row_id'].tolist() == ref_right_only
+    # Matched keys are written back normalized, the same on both sides
+    for k in keys:
+        assert left[k].tolist() == right[k].tolist()
+
+
+def test_blank_keys_never_pair():
+    df1 = pd.DataFrame({'CELL_ID': ['L1', None, '', ' '], 'Quantity': [1, 5871679, 2, 3]})
+    df2 = pd.DataFrame({'CELL_ID': [np.nan, 'L1', ''], 'Quantity': [5871679, 1, 4]})
+    left, right, left_only, right_only = align_on_key(df1, df2, verbose=False)
+    assert left['CELL_ID'].tolist() == ['L1']
+    assert left_only['Quantity'].tolist() == [5871679, 2, 3]
+    assert right_only['Quantity'].tolist() == [5871679, 4]
+
+
+def test_float_keys_join_integer_keys():
+    df1 = pd.DataFrame({'CELL_ID': [555.0, np.nan, 556.0]})
+    df2 = pd.DataFrame({'CELL_ID': ['555', '556 ']})
+    left, right, left_only, right_only = align_on_key(df1, df2, verbose=False)
+    assert left['CELL_ID'].tolist() == ['555', '556']
+    assert len(left_only) == 1 and right_only.empty
+
+
+def test_missing_key_aligns_by_position():
+    df1 = pd.DataFrame({'CELL_ID': ['a', 'b', 'c'], 'Quantity': [1, 2, 3]})
+    df2 = pd.DataFrame({'Quantity': [1, 2]})
+    left, right, left_only, right_only = align_on_key(df1, df2, 'POID', verbose=False)
+    assert left['Quantity'].tolist() == [1, 2] and left_only['Quantity'].tolist() == [3] and right_only.empty
@@ -0,0 +1,120 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import dt_compare
+from dt_compare import compare_incremental
+
+
+def make_frame(keys, seed):
+    rng = np.random.default_rng(seed)
+    n = len(keys)
+    quantity = rng.integers(0, 5, n).astype(float)
+    quantity[rng.random(n) < 0.1] = np.nan
+    return pd.DataFrame({
+        'CELL_ID': keys,
+        'Quantity': quantity,
+        'TEMPLATE_CODE': rng.choice(['A', 'B', 'C', None], n),
+        'POID': [f'P{i % 7}' for i in range(n)],
+    })
+
+
+def assert_same_result(got, expected):
+    names = ['result_df', 'status', 'diffs', 'left_only', 'right_only']
+    for name, a, b in zip(names, got, expected):
+        if name == 'diffs':
+            a = a.astype({'column': str}).sort_values(['row', 'column']).reset_index(drop=True)
+            b = b.astype({'column': str}).sort_values(['row', 'column']).reset_index(drop=True)
+        pd.testing.assert_frame_equal(a, b, check_categorical=False, obj=name)
+
+
+@pytest.fixture
+def base():
+    keys = [f'L{i}' for i in range(200)]
+    return make_frame(keys, 1), make_frame(keys[20:] + [f'N{i}' for i in range(20)], 2)
+
+
+@pytest.fixture
+def patch_calls(monkeypatch):
+    calls = []
+    original = dt_compare._patch
+
+    def spy(*args, **kwargs):
+        calls.append(1)
+        return original(*args, **kwargs)
+    monkeypatch.setattr(dt_compare, '_patch', spy)
+    return calls
+
+
+def edit_values(df1, df2):
+    df2 = df2.copy()
+    df2.loc[[3, 50, 51, 170], 'Quantity'] = 99
+    df2.loc[[10, 11], 'TEMPLATE_CODE'] = None
+    return df1, df2
+
+
+def insert_rows(df1, df2):
+    extra = make_frame([f'L{i}' for i in range(200, 210)] + ['N3', 'L5'], 3)
+    extra = extra.drop_duplicates('CELL_ID')
+    return pd.concat([df1, extra[~extra['CELL_ID'].isin(df1['CELL_ID'])]], ignore_index=True), df2
+
+
+def delete_rows(df1, df2):
+    return df1.drop(index=[0, 25, 26, 199]).reset_index(drop=True), df2.drop(index=[5, 100]).reset_index(drop=True)
+
+
+def rekey_rows(df1, df2):
+    df1 = df1.copy()
+    df1.loc[[30, 31], 'CELL_ID'] = ['N0', 'Z1']
+    return df1, df2
+
+
+def shuffle_and_edit(df1, df2):
+    df1, df2 = edit_values(df1, df2)
+    return df1.sample(frac=1, random_state=4).reset_index(drop=True), df2
+
+
+def blank_keys(df1, df2):
+    df1, df2 = df1.copy(), df2.copy()
+    df1.loc[7, 'CELL_ID'] = None
+    df2.loc[60, 'CELL_ID'] = ' '
+    df2.loc[61, 'Quantity'] = 42
+    return df1, df2
+
+
+@pytest.mark.parametrize('change', [edit_values, insert_rows, delete_rows, rekey_rows, shuffle_and_edit, blank_keys])
+def test_incremental_equals_full(base, patch_calls, change):
+    previous = compare_incremental(*base, verbose=False)
+    df1, df2 = change(*base)
+
+    got, hashes = compare_incremental(df1, df2, previous=previous, max_changed=1.0, verbose=False)
+    assert patch_calls, "the incremental path was not taken"
+    expected, expected_hashes = compare_incremental(df1, df2, verbose=False)
+
+    assert_same_result(got, expected)
+    pd.testing.assert_series_equal(hashes[0], expected_hashes[0])
+    pd.testing.assert_series_equal(hashes[1], expected_hashes[1])
+
+
+def test_chained_incremental_runs(base, patch_calls):
+    # Each run starts from the previous incremental result, not from a full one
+    previous = compare_incremental(*base, verbose=False)
+    df1, df2 = base
+    for change in (edit_values, delete_rows, insert_rows, rekey_rows):
+        df1, df2 = change(df1, df2)
+        previous = compare_incremental(df1, df2, previous=previous, max_changed=1.0, verbose=False)
+        assert_same_result(previous[0], compare_incremental(df1, df2, verbose=False)[0])
+    assert len(patch_calls) == 4
+
+
+def test_falls_back_to_full_comparison(base, patch_calls):
+    previous = compare_incremental(*base, verbose=False)
+    df1, df2 = base
+    dup = pd.concat([df1, df1.iloc[[4]]], ignore_index=True)
+    got = compare_incremental(dup, df2, previous=previous, max_changed=1.0, verbose=False)[0]
+    assert_same_result(got, compare_incremental(dup, df2, verbose=False)[0])
+
+    edited = df2.assign(Quantity=df2['Quantity'] + 1)
+    got = compare_incremental(df1, edited, previous=previous, verbose=False)[0]
+    assert_same_result(got, compare_incremental(df1, edited, verbose=False)[0])
+    assert not patch_calls
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import dt_stream
+from dt_compare import COLUMN_MAPPING, align_on_key, apply_mapping, compare_frames, render_result, summarize
+from dt_stream import compare_streaming
+
+
+def write_pair(tmp_path, n, seed, duplicates=False):
+    rng = np.random.default_rng(seed)
+    keys = np.array([f'L{i}' for i in range(n)], dtype=object)
+    if duplicates:
+        keys[rng.random(n) < 0.1] = 'L0'
+    df1 = pd.DataFrame({'CELL_ID': keys, 'Quantity': rng.integers(0, 4, n), 'POID': rng.choice(['a', 'b', None], n)})
+    df2 = df1.sample(frac=0.95, random_state=seed).copy()
+    changed = rng.random(len(df2)) < 0.1
+    df2.loc[changed, 'Quantity'] = df2.loc[changed, 'Quantity'] + 1
+    df2 = pd.concat([df2, pd.DataFrame({'CELL_ID': [f'N{i}' for i in range(5)], 'Quantity': 1, 'POID': 'c'})])
+    path1, path2 = tmp_path / 'file1.csv', tmp_path / 'file2.csv'
+    df1.to_csv(path1, index=False)
+    df2.to_csv(path2, index=False)
+    return str(path1), str(path2)
+
+
+def full_comparison(path1, path2):
+    # The same comparison in memory, on the frames read_chunks would produce
+    df1 = apply_mapping(pd.read_csv(path1, dtype=object), COLUMN_MAPPING)
+    df2 = apply_mapping(pd.read_csv(path2, dtype=object), COLUMN_MAPPING)
+    left, right, left_only, right_only = align_on_key(df1, df2, verbose=False)
+    result_df, status, diffs = compare_frames(left, right)
+    return render_result(result_df, status, diffs), left_only, right_only, summarize(status, left_only, right_only)
+
+
+def read_sorted(path):
+    # Streaming output is grouped by partition; occurrence order within a key is kept, so a stable sort lines it up
+    if not path.exists():
+        return pd.DataFrame()
+    df = pd.read_csv(path, dtype=str, keep_default_na=False)
+    return df.sort_values('CELL_ID', kind='stable').reset_index(drop=True)
+
+
+def assert_same(out_path, expected):
+    result, left_only, right_only, counts = expected
+    stem = out_path.with_suffix('')
+    for path, frame in ((out_path, result), (stem.parent / f'{stem.name}_only_in_file1.csv', left_only),
+                        (stem.parent / f'{stem.name}_only_in_file2.csv', right_only)):
+        got = read_sorted(path)
+        want = frame.astype(object).where(frame.notna(), '').astype(str)
+        want = want.sort_values('CELL_ID', kind='stable').reset_index(drop=True) if len(want) else pd.DataFrame()
+        pd.testing.assert_frame_equal(got, want, check_dtype=False)
+
+
+@pytest.mark.parametrize('rows, chunksize, duplicates', [(1500, 10_000, False), (1500, 40, False), (300, 3, False),
+                                                         (300, 3, True)])
+def test_streaming_equals_full(tmp_path, monkeypatch, rows, chunksize, duplicates):
+    levels = []
+    partition = dt_stream._partition
+
+    def spy(chunks, keys, out_dir, level):
+        levels.append(level)
+        return partition(chunks, keys, out_dir, level)
+    monkeypatch.setattr(dt_stream, '_partition', spy)
+
+    path1, path2 = write_pair(tmp_path, rows, chunksize, duplicates)
+    out_path = tmp_path / 'result.csv'
+    totals = compare_streaming(path1, path2, str(out_path), chunksize=chunksize)
+
+    expected = full_comparison(path1, path2)
+    assert totals == expected[3]
+    assert_same(out_path, expected)
+    # Small chunks leave buckets bigger than 2 * chunksize, which are split again on the next hash bits
+    assert (max(levels) > 0) == (chunksize < 20)
+
+
+def test_streaming_stops_splitting_at_max_level(tmp_path, monkeypatch):
+    # Rows of one duplicated key always hash to the same bucket, so splitting can never make it smaller
+    monkeypatch.setattr(dt_stream, 'MAX_LEVEL', 3)
+    path1, path2 = write_pair(tmp_path, 100, 7)
+    df1 = pd.read_csv(path1).assign(CELL_ID='L1')
+    df1.to_csv(path1, index=False)
+    out_path = tmp_path / 'result.csv'
+    totals = compare_streaming(path1, path2, str(out_path), chunksize=2)
+    expected = full_comparison(path1, path2)
+    assert totals == expected[3]
+    assert_same(out_path, expected)
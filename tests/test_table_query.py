@@ -0,0 +1,60 @@
+import os
+import runpy
+
+import pandas as pd
+import pytest
+
+from conftest import ROOT
+
+app = runpy.run_path(os.path.join(ROOT, 'DT Comparison.py'), run_name='dt_comparison_app')
+apply_table_query = app['apply_table_query']
+
+
+@pytest.fixture
+def mismatches():
+    return pd.DataFrame({
+        'CELL_ID': ['L1', 'L2', 'L3', 'L4'],
+        'POID': ['DIFF: K9:1 | K9:2', 'K9:3', 'x', None],
+        'Quantity': [3, 'DIFF: 10 | 12', 7, 5],
+        'TEMPLATE_CODE': ['abc', 'ABC', '', 'Abd'],
+    })
+
+
+def ids(df):
+    return df['CELL_ID'].tolist()
+
+
+# Filter strings as DataTable 4 sends them from the column filter row
+@pytest.mark.parametrize('query, expected', [
+    ('{POID} scontains DIFF', ['L1']),
+    ('{POID} scontains "DIFF:"', ['L1']),
+    ('{TEMPLATE_CODE} scontains ab', ['L1']),
+    ('{TEMPLATE_CODE} icontains ab', ['L1', 'L2', 'L4']),
+    ('{Quantity} s> 5', ['L3']),
+    ('{Quantity} s>= 5', ['L3', 'L4']),
+    ('{Quantity} s< 5', ['L1']),
+    ('{Quantity} scontains 5', ['L4']),
+    ('{POID} s= x', ['L3']),
+    ('{POID} s= X', []),
+    ('{POID} i= X', ['L3']),
+    ('{POID} s!= x', ['L1', 'L2', 'L4']),
+    ('{TEMPLATE_CODE} is blank', ['L3']),
+    ('{POID} is nil', ['L4']),
+    ('{POID} is not blank', ['L1', 'L2', 'L3']),
+    ('{POID} scontains K9 && {Quantity} scontains DIFF', ['L2']),
+    ('{Quantity} >= 5', ['L3', 'L4']),
+    ('', ['L1', 'L2', 'L3', 'L4']),
+])
+def test_datatable_filters(mismatches, query, expected):
+    assert ids(apply_table_query(mismatches, [], query)) == expected
+
+
+@pytest.mark.parametrize('query', ['{Quantity} is prime', '{POID} is', '{POID} sfoo x'])
+def test_unsupported_filters_are_rejected(mismatches, query):
+    with pytest.raises(ValueError):
+        apply_table_query(mismatches, [], query)
+
+
+def test_sort_numbers_and_text(mismatches):
+    sort_by = [{'column_id': 'TEMPLATE_CODE', 'direction': 'desc'}]
+    assert ids(apply_table_query(mismatches, sort_by, '')) == ['L1', 'L4', 'L2', 'L3']